@@ -1,5 +1,7 @@
 from fastapi import APIRouter, HTTPException, Query
-from app.services.local_symbol_service import load_symbols
+from typing import Optional
+from app.services.local_symbol_service import VALID_TYPES
+from app.services.symbol_search import get_search_index, search_all_types
 
 router = APIRouter()
 @router.get("/autocomplete/{instrument_type}")
@@ -9,25 +11,26 @@ def autocomplete_symbols(
     limit: int = Query(20, ge=1, le=100)
 ):
     try:
-        data = load_symbols(instrument_type)
+        index = get_search_index(instrument_type)
     except FileNotFoundError:
         raise HTTPException(status_code=404, detail="Instrument type not found")
 
-    q = q.lower()
-    results = []
+    # Ranked: exact symbol, symbol prefix, name token prefix, substring
+    return index.search(q, limit)
 
-    for symbol, item in data.items():
-        if item is None:
-            continue
-
-        name = item.get("name")
-        if name and (q in symbol.lower() or q in name.lower()):
-            results.append({
-                "symbol": symbol,
-                "name": name
-            })
-
-        if len(results) >= limit:
-            break
+@router.get("/search")
+def search_all_instruments(
+    q: str = Query(..., min_length=1),
+    limit: int = Query(20, ge=1, le=100),
+    per_type: int = Query(10, ge=1, le=100),
+    types: Optional[str] = Query(None, description="Comma-separated instrument types, default all")
+):
+    if types:
+        selected = [t.strip().lower() for t in types.split(",") if t.strip()]
+        unknown = [t for t in selected if t not in VALID_TYPES]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unsupported instrument types: {unknown}")
+    else:
+        selected = None
 
-    return results
+    return search_all_types(q, limit, per_type, selected)
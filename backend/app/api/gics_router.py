@@ -1,23 +1,41 @@
-from fastapi import APIRouter, Query
+from fastapi import APIRouter, Query, Request, Response
 from typing import Optional
-from app.services.gics_service import get_all_sectors, filter_gics_data, get_gics_hierarchy
+from app.services.gics_service import (
+    Payload,
+    get_all_sectors_payload,
+    filter_gics_payload,
+    get_gics_hierarchy_payload,
+)
 
 router = APIRouter()
 
+def _conditional_response(request: Request, payload: Payload) -> Response:
+    # The taxonomy is static: serve the pre-serialized body, or 304 when the
+    # client already holds it
+    headers = {"ETag": payload.etag, "Cache-Control": "public, max-age=3600"}
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        if "*" in tags or payload.etag in tags:
+            return Response(status_code=304, headers=headers)
+    return Response(content=payload.body, media_type="application/json", headers=headers)
+
 @router.get("/sectors")
-def list_sectors():
-    return get_all_sectors()
+def list_sectors(request: Request):
+    return _conditional_response(request, get_all_sectors_payload())
 
 @router.get("/filter")
 def filter_gics(
+    request: Request,
     filter_type: str = Query(..., description="sector, industry_group, industry, sub_industry"),
     sector: Optional[str] = Query(None),
     industry_group: Optional[str] = Query(None),
     industry: Optional[str] = Query(None),
     sub_industry: Optional[str] = Query(None),
 ):
-    return filter_gics_data(filter_type, sector, industry_group, industry, sub_industry)
+    payload = filter_gics_payload(filter_type, sector, industry_group, industry, sub_industry)
+    return _conditional_response(request, payload)
 
 @router.get("/hierarchy")
-def full_hierarchy():
-    return get_gics_hierarchy()
\ No newline at end of file
+def full_hierarchy(request: Request):
+    return _conditional_response(request, get_gics_hierarchy_payload())
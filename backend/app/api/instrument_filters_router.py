@@ -1,5 +1,8 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Query, Request
+from typing import Optional
 from app.services.local_symbol_service import load_symbols
+from app.services.facet_index import get_facet_index
+from app.services.query_filter_resolver import resolve_filters
 
 router = APIRouter()
 
@@ -21,3 +24,28 @@ def get_filter_keys(instrument_type: str):
         "type": instrument_type,
         "fields": field_names
     }
+
+@router.get("/facets/{instrument_type}")
+def get_facets(
+    instrument_type: str,
+    request: Request,
+    fields: Optional[str] = Query(None, description="Comma-separated facet fields, default all"),
+    limit: Optional[int] = Query(None, ge=1, description="Max values per facet")
+):
+    query_params = dict(request.query_params)
+    query_params.pop("fields", None)
+    query_params.pop("limit", None)
+    conditions = resolve_filters(instrument_type, query_params)
+
+    try:
+        index = get_facet_index(instrument_type)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Instrument type not found")
+
+    selected = [f.strip() for f in fields.split(",") if f.strip()] if fields else None
+
+    return {
+        "type": instrument_type,
+        "fields": index.fields,
+        "facets": index.counts(conditions, selected, limit)
+    }
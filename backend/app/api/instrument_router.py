@@ -1,57 +1,103 @@
 from fastapi import APIRouter, Query, Request, HTTPException
+from fastapi.responses import StreamingResponse
 from typing import Optional
-from app.services.local_symbol_service import load_symbols, get_available_instrument_types
-from app.services.query_filter_resolver import get_filter_model
+import base64
+import binascii
+import json
+import numpy as np
+from app.services.local_symbol_service import get_available_instrument_types, get_catalog_stats
+from app.services.query_cache import get_matches, get_match_cache_stats
+from app.services.query_filter_resolver import resolve_filters
 
 router = APIRouter()
 
+STREAM_BATCH_SIZE = 1000
+PAGING_PARAMS = ("limit", "offset", "cursor", "format")
+
+
+def _encode_cursor(symbol: str) -> str:
+    return base64.urlsafe_b64encode(json.dumps({"after": symbol}).encode()).decode()
+
+
+def _decode_cursor(cursor: str) -> str:
+    try:
+        return json.loads(base64.urlsafe_b64decode(cursor.encode()))["after"]
+    except (binascii.Error, ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def _stream_ndjson(store, positions):
+    for start in range(0, len(positions), STREAM_BATCH_SIZE):
+        rows = store.rows(positions[start:start + STREAM_BATCH_SIZE])
+        yield "".join(json.dumps(row) + "\n" for row in rows)
+
+
 @router.get("/types")
 def list_instrument_types():
     return {"available": get_available_instrument_types()}
 
+@router.get("/catalog/stats")
+def catalog_stats():
+    return get_catalog_stats()
+
+@router.get("/catalog/query-cache")
+def query_cache_stats():
+    return get_match_cache_stats()
+
 @router.get("/{instrument_type}")
 def get_instruments(
     instrument_type: str,
     request: Request,
     limit: Optional[int] = Query(None, ge=1),
-    offset: int = Query(0, ge=0)
+    offset: int = Query(0, ge=0),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page"),
+    format: str = Query("json", enum=["json", "ndjson"])
 ):
-    # Step 1: resolve correct filter model based on instrument type
-    FilterModel = get_filter_model(instrument_type)
-
-    # Step 2: extract and validate query parameters
+    # Step 1: validate query parameters against the type's filter model and
+    # parse operators ("eq:", "in:", "prefix:", "gte:"...; bare values = contains)
     query_params = dict(request.query_params)
-    query_params.pop("limit", None)
-    query_params.pop("offset", None)
-
-    try:
-        filters = FilterModel(**query_params)
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=f"Invalid query params: {str(e)}")
+    for param in PAGING_PARAMS:
+        query_params.pop(param, None)
+    conditions = resolve_filters(instrument_type, query_params)
 
-    # Step 3: load data and apply filtering
+    # Step 2: match-set from the query cache (computed from the column
+    # indexes on a miss), materialize only the page
     try:
-        data = load_symbols(instrument_type)
+        store, positions = get_matches(instrument_type, conditions)
     except FileNotFoundError:
         raise HTTPException(status_code=404, detail="Instrument type not found")
 
-    filtered = []
-    for sym, item in data.items():
-        match = True
-        for key, value in filters.dict(exclude_none=True).items():
-            target = sym if key == "symbol" else item.get(key)
-            if value.lower() not in str(target).lower():
-                match = False
-                break
-        if match:
-            filtered.append({"symbol": sym, **item})
-
-    results = filtered[offset:]
+    count = len(positions)
+
+    # Keyset pagination: resume right after the last symbol of the previous
+    # page instead of counting matches from the start
+    if cursor is not None:
+        after = store.position_of(_decode_cursor(cursor))
+        if after is None:
+            raise HTTPException(status_code=400, detail="Cursor refers to an unknown symbol")
+        positions = positions[np.searchsorted(positions, after, side="right"):]
+
+    page = positions[offset:]
     if limit is not None:
-        results = results[:limit]
+        page = page[:limit]
+
+    next_cursor = None
+    if limit is not None and len(page) and offset + len(page) < len(positions):
+        next_cursor = _encode_cursor(store.symbols[page[-1]])
+
+    if format == "ndjson":
+        headers = {"X-Total-Count": str(count)}
+        if next_cursor:
+            headers["X-Next-Cursor"] = next_cursor
+        return StreamingResponse(
+            _stream_ndjson(store, page),
+            media_type="application/x-ndjson",
+            headers=headers
+        )
 
     return {
         "type": instrument_type,
-        "count": len(filtered),
-        "results": results
+        "count": count,
+        "next_cursor": next_cursor,
+        "results": store.rows(page)
     }
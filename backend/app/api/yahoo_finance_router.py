@@ -1,39 +1,80 @@
-from fastapi import APIRouter, HTTPException, Query
-from typing import Optional
-from pathlib import Path
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import Response, StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from typing import List, Optional
 import pandas as pd
-import yfinance as yf
 import numpy as np
-from datetime import datetime, timedelta
+import asyncio
+import functools
+from collections import defaultdict
 import traceback
 import sys
+from app.services.history_service import INTERVAL_WINDOWS, refresh_histories, refresh_history
+from app.services.history_formats import MEDIA_TYPES, epoch_ms, iter_csv, iter_ndjson, negotiate_format, to_arrow, to_json
+from app.services.history_resample import read_history, resample_source
+from app.services.history_store import INT_COLUMNS
+from app.services.fundamentals_cache import fundamentals_cache
+from app.services.fundamentals_service import SECTION_LOADERS, load_section, load_sections
+from app.services.market_data import market_data
+from app.services.request_coalescing import run_upstream, single_flight
+from app.services.upstream_client import is_rate_limited, upstream_client
 
 router = APIRouter()
 
-CACHE_DIR = Path(__file__).parent.parent / "data" / "yfinance_cache"
-CACHE_DIR.mkdir(parents=True, exist_ok=True)
 
-INTERVAL_WINDOWS = {
-    "1m": timedelta(days=7),
-    "5m": timedelta(days=30),
-    "15m": timedelta(days=60),
-    "30m": timedelta(days=60),
-    "1h": timedelta(days=730),
-    "1d": timedelta(days=3650),
-    "1wk": timedelta(days=3650),
-    "1mo": timedelta(days=3650)
-}
+def cached_upstream(section: str):
+    """
+    Serve a blocking yfinance handler from the async path through the
+    fundamentals cache: fresh copies are returned directly, stale ones are
+    returned while a background refresh runs, and identical concurrent
+    misses share one upstream call within the upstream concurrency cap.
+    """
+    def decorate(fn):
+        @functools.wraps(fn)
+        async def endpoint(**params):
+            key = "|".join(str(value).upper() for value in params.values())
+            return await fundamentals_cache.get(section, key, functools.partial(fn, **params))
+        return endpoint
+    return decorate
+
+
+@router.get("/upstream/stats")
+def get_upstream_stats():
+    return {**single_flight.stats(), "provider": market_data.name, "client": upstream_client.stats()}
+
+
+def _no_data(detail: str, refresh_error: Optional[Exception] = None) -> HTTPException:
+    # Nothing stored to fall back on: say why upstream had nothing either
+    throttled_for = upstream_client.throttled_for()
+    if throttled_for > 0:
+        return HTTPException(status_code=503, detail="Upstream rate limit, retry later",
+                             headers={"Retry-After": str(max(1, round(throttled_for)))})
+    if refresh_error is not None:
+        return HTTPException(status_code=502, detail=f"Upstream error: {refresh_error}")
+    return HTTPException(status_code=404, detail=detail)
+
+
+@router.get("/cache/stats")
+def get_cache_stats():
+    return fundamentals_cache.stats()
+
+
+MAX_BATCH_SYMBOLS = 500
+
+
+def _parse_symbols(symbols: str) -> List[str]:
+    tickers = list(dict.fromkeys(s.strip().upper() for s in symbols.split(",") if s.strip()))
+    if not tickers:
+        raise HTTPException(status_code=400, detail="No symbols given")
+    if len(tickers) > MAX_BATCH_SYMBOLS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_SYMBOLS} symbols per request")
+    return tickers
 
-@router.get("/history/{symbol}")
-def get_historical_data(
-    symbol: str,
-    interval: str = Query("1d", enum=list(INTERVAL_WINDOWS.keys())),
-    start: Optional[str] = Query("auto"),
-    end: Optional[str] = None,
-    limit: int = Query(100, ge=1, le=1000)
-):
-    cache_file = CACHE_DIR / f"{symbol}_{interval}.csv"
-    now = datetime.utcnow()
+
+def _resolve_range(interval: str, start: Optional[str], end: Optional[str]):
+    # Whole minutes: concurrent "auto" or open-ended requests resolve to the
+    # same range and can share a refresh
+    now = pd.Timestamp.utcnow().tz_localize(None).ceil("min")
 
     max_back = INTERVAL_WINDOWS[interval]
     min_allowed_start = now - max_back
@@ -45,374 +86,327 @@ def get_historical_data(
 
     end_date = pd.to_datetime(end or now)
 
-    # Normalize timezone for safety
+    # Stored bars are tz-naive UTC
     if start_date.tzinfo:
-        start_date = start_date.tz_localize(None)
+        start_date = start_date.tz_convert("UTC").tz_localize(None)
     if end_date.tzinfo:
-        end_date = end_date.tz_localize(None)
+        end_date = end_date.tz_convert("UTC").tz_localize(None)
 
     if start_date < min_allowed_start:
         start_date = min_allowed_start
 
-    print(f"[DEBUG] Fetching {symbol} from {start_date} to {end_date} with interval {interval}")
-
-    if cache_file.exists():
-        try:
-            df_cache = pd.read_csv(cache_file, index_col=0)
-            df_cache.index = pd.to_datetime(df_cache.index, errors='coerce')
-            df_cache = df_cache[~df_cache.index.isna()]
-            print(f"[DEBUG] Loaded cache with {len(df_cache)} valid datetime rows")
-        except Exception as e:
-            print(f"[ERROR] Failed to load cache: {e}")
-            df_cache = None
-            cache_file.unlink(missing_ok=True)
-    else:
-        df_cache = None
+    return start_date, end_date
 
-    full_df = df_cache if df_cache is not None else pd.DataFrame()
 
-    if df_cache is not None and not df_cache.empty:
-        last_date = df_cache.index.max()
-        print(f"[DEBUG] last_date value: {last_date} (type: {type(last_date)})")
-        if pd.isna(last_date):
-            fetch_from = start_date
+@router.get("/history")
+async def get_batch_historical_data(
+    symbols: str = Query(..., description="Comma-separated tickers"),
+    interval: str = Query("1d", enum=list(INTERVAL_WINDOWS.keys())),
+    start: Optional[str] = Query("auto"),
+    end: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=1000, description="Newest bars per symbol"),
+    layout: str = Query("long", enum=["long", "wide"])
+):
+    """
+    History for many symbols in one round trip. Series already stored are
+    only topped up; the rest are fetched with grouped multi-ticker downloads.
+    Bars come oldest first: one row per (symbol, timestamp) in the long
+    layout, or one array per symbol and field aligned on the union of
+    timestamps in the wide layout (null where a symbol has no bar).
+    Timestamps are epoch milliseconds, as from /history/{symbol}.
+    """
+    tickers = _parse_symbols(symbols)
+    start_date, end_date = _resolve_range(interval, start, end)
+    print(f"[DEBUG] Fetching {len(tickers)} symbols from {start_date} to {end_date} with interval {interval}")
+
+    # Symbols whose finer bars already cover the range are resampled locally
+    sources = await run_in_threadpool(
+        lambda: {ticker: resample_source(ticker, interval, start_date, end_date) for ticker in tickers}
+    )
+    by_fetch_interval = defaultdict(list)
+    for ticker in tickers:
+        by_fetch_interval[sources[ticker] or interval].append(ticker)
+
+    refreshes = [
+        single_flight.do(
+            ("history", tuple(sorted(group)), fetch_interval, start_date, end_date),
+            refresh_histories, group, fetch_interval, start_date, end_date
+        )
+        for fetch_interval, group in by_fetch_interval.items()
+    ]
+    refresh_error = None
+    for result in await asyncio.gather(*refreshes, return_exceptions=True):
+        if isinstance(result, Exception):
+            print(f"[ERROR] Failed to refresh history: {result}")
+            refresh_error = result
         else:
-            fetch_from = last_date + timedelta(minutes=1)
-    else:
-        fetch_from = start_date
-
-    # Normalize fetch_from timezone
-    if fetch_from.tzinfo:
-        fetch_from = fetch_from.tz_localize(None)
-
-    batched_data = []
-    current_start = fetch_from
-    window = INTERVAL_WINDOWS[interval]
-
-    while current_start < end_date:
-        current_end = min(current_start + window, end_date)
-        print(f"[DEBUG] Downloading: {symbol} from {current_start} to {current_end}")
-        try:
-            df = yf.download(
-                symbol,
-                start=current_start,
-                end=current_end,
-                interval=interval,
-                progress=False,
-                threads=False
-            )
-            if isinstance(df, pd.DataFrame) and not df.empty:
-                df.index = pd.to_datetime(df.index)
-                batched_data.append(df)
-                print(f"[DEBUG] Downloaded {len(df)} rows")
-            else:
-                print("[DEBUG] No data returned for this batch")
-        except Exception as e:
-            print(f"[ERROR] Failed batch: {e}")
-        current_start = current_end + timedelta(minutes=1)
-
-    if batched_data:
-        df_new = pd.concat(batched_data)
-        df_combined = pd.concat([full_df, df_new]) if not full_df.empty else df_new
-        df_combined = df_combined[~df_combined.index.duplicated(keep="last")]
-        df_combined.sort_index(inplace=True)
-        df_combined.to_csv(cache_file)
-        print(f"[DEBUG] Saved updated data to cache with {len(df_combined)} rows")
-    elif full_df is not None and not full_df.empty:
-        df_combined = full_df
-        print("[DEBUG] Used existing cached data")
-    else:
-        raise HTTPException(status_code=404, detail="No data found for this symbol")
+            print(f"[DEBUG] Stored {sum(result.values())} new rows")
+
+    return await run_in_threadpool(
+        _batch_payload, tickers, sources, interval, start_date, end_date, limit, layout, refresh_error
+    )
+
+
+def _batch_payload(tickers, sources, interval, start_date, end_date, limit, layout, refresh_error=None):
+    frames = {}
+    for ticker in tickers:
+        df = read_history(ticker, interval, start_date, end_date, limit, sources[ticker])
+        if not df.empty:
+            frames[ticker] = df.sort_index()
+    missing = [ticker for ticker in tickers if ticker not in frames]
+
+    if not frames:
+        raise _no_data("No data found for these symbols", refresh_error)
+
+    combined = pd.concat(frames, names=["symbol"])
+    combined = combined.replace({np.nan: None, np.inf: None, -np.inf: None})
+
+    if layout == "long":
+        combined = combined.reset_index()
+        # Epoch milliseconds, as /history/{symbol} sends them
+        combined["timestamp"] = epoch_ms(pd.DatetimeIndex(combined["timestamp"]))
+        return {
+            "interval": interval,
+            "layout": layout,
+            "missing": missing,
+            "rows": combined.to_dict(orient="records")
+        }
 
-    try:
-        df_combined = df_combined.sort_index(ascending=False)
+    timestamps = combined.index.get_level_values("timestamp").unique().sort_values()
+    data = {}
+    for ticker, df in combined.groupby(level="symbol"):
+        aligned = df.droplevel("symbol").reindex(timestamps)
+        # Missing bars become null without turning Volume into floats
+        aligned = aligned.astype({col: "Int64" for col in INT_COLUMNS if col in aligned.columns})
+        aligned = aligned.astype(object).where(aligned.notna(), None)
+        data[ticker] = {col: aligned[col].tolist() for col in aligned.columns}
+    return {
+        "interval": interval,
+        "layout": layout,
+        "missing": missing,
+        "timestamps": epoch_ms(timestamps).tolist(),
+        "data": data
+    }
 
-        if hasattr(df_combined.index, 'tz') and df_combined.index.tz is not None:
-            df_combined.index = df_combined.index.tz_localize(None)
 
-        for col in df_combined.columns:
-            if pd.api.types.is_datetime64tz_dtype(df_combined[col]):
-                df_combined[col] = df_combined[col].dt.tz_localize(None)
+@router.get("/history/{symbol}")
+async def get_historical_data(
+    symbol: str,
+    request: Request,
+    interval: str = Query("1d", enum=list(INTERVAL_WINDOWS.keys())),
+    start: Optional[str] = Query("auto"),
+    end: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    order: str = Query("desc", enum=["desc", "asc"]),
+    format: Optional[str] = Query(None, enum=list(MEDIA_TYPES.keys()), description="Overrides the Accept header")
+):
+    """
+    The newest ``limit`` bars of the window. JSON is column arrays with
+    epoch-millisecond timestamps; Arrow IPC, CSV and NDJSON are served for
+    ``format=`` or a matching Accept header.
+    """
+    # Same series as the batch endpoint's: stored under the upper-cased ticker
+    symbol = symbol.strip().upper()
+    start_date, end_date = _resolve_range(interval, start, end)
+
+    print(f"[DEBUG] Fetching {symbol} from {start_date} to {end_date} with interval {interval}")
+
+    # Build from finer cached bars when they cover the range; only their tail is fetched
+    source = await run_in_threadpool(resample_source, symbol, interval, start_date, end_date)
+    if source:
+        print(f"[DEBUG] Resampling {interval} bars from cached {source} bars")
+    fetch_interval = source or interval
 
-        df_combined = df_combined.replace({np.nan: None, np.inf: None, -np.inf: None})
-        df_combined.index = df_combined.index.astype(str)
+    refresh_error = None
+    try:
+        # Concurrent requests for the same series and range share one refresh
+        new_rows = await single_flight.do(
+            ("history", symbol, fetch_interval, start_date, end_date),
+            refresh_history, symbol, fetch_interval, start_date, end_date
+        )
+        print(f"[DEBUG] Stored {new_rows} new rows")
+    except Exception as e:
+        # Stored bars are still served; the error only matters if there are none
+        print(f"[ERROR] Failed to refresh history: {e}")
+        refresh_error = e
+
+    # Only the requested window, newest first, capped by limit
+    preview = await run_in_threadpool(read_history, symbol, interval, start_date, end_date, limit, source)
+    if preview.empty:
+        raise _no_data("No data found for this symbol", refresh_error)
+    if order == "asc":
+        preview = preview.iloc[::-1]
+
+    wire_format = negotiate_format(request.headers.get("accept"), format)
+    media_type = MEDIA_TYPES[wire_format]
+    if wire_format == "csv":
+        return StreamingResponse(iter_csv(preview), media_type=media_type)
+    if wire_format == "ndjson":
+        return StreamingResponse(iter_ndjson(preview), media_type=media_type)
 
-        preview = df_combined.head(limit)
-        print("[DEBUG] DataFrame preview constructed successfully.")
-        return {"preview": preview.to_json()}
+    try:
+        encode = to_arrow if wire_format == "arrow" else to_json
+        body = await run_in_threadpool(encode, preview, symbol=symbol, interval=interval)
+        return Response(content=body, media_type=media_type)
     except Exception as e:
         print("[CRITICAL] Exception caught while preparing response:")
         traceback.print_exc(file=sys.stdout)
         raise HTTPException(status_code=500, detail=f"Response error: {str(e)}")
 
+
+@router.get("/fundamentals")
+async def get_bulk_fundamentals(
+    symbols: str = Query(..., description="Comma-separated tickers"),
+    sections: str = Query("info", description=f"Comma-separated, from: {', '.join(SECTION_LOADERS)}")
+):
+    """
+    Several sections for many symbols in one call. Fresh cached sections
+    are returned as is; the rest are fetched with one ticker per symbol,
+    symbols running in parallel within the upstream concurrency cap. A
+    failing (symbol, section) lands in "errors" without failing the batch.
+    """
+    tickers = _parse_symbols(symbols)
+    wanted = list(dict.fromkeys(s.strip().lower() for s in sections.split(",") if s.strip()))
+    unknown = [section for section in wanted if section not in SECTION_LOADERS]
+    if not wanted or unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown sections: {unknown}" if unknown else "No sections given")
+
+    cached = await run_in_threadpool(
+        lambda: {(ticker, section): fundamentals_cache.lookup(section, ticker) for ticker in tickers for section in wanted}
+    )
+    results = defaultdict(dict)
+    errors = defaultdict(dict)
+    to_fetch = defaultdict(list)
+    for (ticker, section), entry in cached.items():
+        if fundamentals_cache.is_fresh(section, entry):
+            results[ticker][section] = entry.value
+        else:
+            to_fetch[ticker].append(section)
+
+    def fetch(ticker: str, missing: List[str]):
+        loaded = load_sections(ticker, missing)
+        for section, (ok, value) in loaded.items():
+            if ok:
+                loaded[section] = (True, fundamentals_cache.store(section, ticker, value))
+        return loaded
+
+    jobs = list(to_fetch.items())
+    outcomes = await asyncio.gather(
+        *[run_upstream(fetch, ticker, missing) for ticker, missing in jobs],
+        return_exceptions=True
+    )
+    for (ticker, missing), outcome in zip(jobs, outcomes):
+        for section in missing:
+            ok, value = outcome.get(section) if isinstance(outcome, dict) else (False, outcome)
+            stale = cached[(ticker, section)]
+            if ok:
+                results[ticker][section] = value
+            elif stale is not None:
+                results[ticker][section] = stale.value
+            else:
+                status = value.status_code if isinstance(value, HTTPException) else 500
+                detail = value.detail if isinstance(value, HTTPException) else str(value)
+                errors[ticker][section] = {"status": status, "detail": detail}
+
+    print(f"[DEBUG] Bulk fundamentals: {len(tickers)} symbols, {len(jobs)} fetched, {sum(map(len, errors.values()))} errors")
+    return {"sections": wanted, "results": results, "errors": errors}
+
+
 @router.get("/info/{symbol}")
+@cached_upstream("info")
 def get_symbol_info(symbol: str):
-    try:
-        ticker=yf.Ticker(symbol)
-        info=ticker.info
-        if not info:
-            raise HTTPException(status_code=404, detail="No information found for this symbol.")
-        return info
-    except Exception as e:
-        print((f"[ERROR] Failed to get info for {symbol}: {e}"))
-        raise HTTPException(status_code=500, detail=str(e))
+    return load_section("info", market_data.ticker(symbol))
 
 
 @router.get("/actions/{symbol}")
+@cached_upstream("actions")
 def get_actions(symbol: str):
-    try:
-        ticker = yf.Ticker(symbol)
-        actions = ticker.actions
-        if actions is None or actions.empty:
-            raise HTTPException(status_code=404, detail="No corporate actions found for this symbol")
-        actions.index = actions.index.astype(str)
-        return {"actions": actions.to_dict(orient="index")}
-    except Exception as e:
-        print(f"[ERROR] Failed to fetch actions: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
+    return load_section("actions", market_data.ticker(symbol))
+
 
 @router.get("/dividends/{symbol}")
+@cached_upstream("dividends")
 def get_dividends(symbol: str):
-    try:
-        ticker = yf.Ticker(symbol)
-        dividends = ticker.dividends
-        if dividends is None or dividends.empty:
-            raise HTTPException(status_code=404, detail="No dividends found for this symbol")
-        dividends.index = dividends.index.astype(str)
-        return {"dividends": dividends.to_dict()}
-    except Exception as e:
-        print(f"[ERROR] Failed to fetch dividends: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
+    return load_section("dividends", market_data.ticker(symbol))
+
 
 @router.get("/splits/{symbol}")
+@cached_upstream("splits")
 def get_splits(symbol: str):
-    
-    try:
-        ticker = yf.Ticker(symbol)
-        splits = ticker.splits
-        if splits is None or splits.empty:
-            raise HTTPException(status_code=404, detail="No splits found for this symbol")
-        splits.index = splits.index.astype(str)
-        return {"splits": splits.to_dict()}
-    except Exception as e:
-        print(f"[ERROR] Failed to fetch splits: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
-@router.get("/financials/{symbol}")
+    return load_section("splits", market_data.ticker(symbol))
 
-def get_financials(symbol: str):
-    try:
-        ticker = yf.Ticker(symbol)
-        financials = ticker.financials
-
-        if financials is None or financials.empty:
-            raise HTTPException(status_code=404, detail="No financial data found for this symbol")
-
-        financials.index = financials.index.astype(str)
-        financials.columns = financials.columns.astype(str)
 
-        # ⛏️ Curățăm NaN, inf, -inf
-        cleaned = financials.replace({np.nan: None, np.inf: None, -np.inf: None})
+@router.get("/financials/{symbol}")
+@cached_upstream("financials")
+def get_financials(symbol: str):
+    return load_section("financials", market_data.ticker(symbol))
 
-        return {"financials": cleaned.to_dict()}
-    except Exception as e:
-        print(f"[ERROR] Failed to fetch financials for {symbol}: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/balance-sheet/{symbol}")
+@cached_upstream("balance-sheet")
 def get_balance_sheet(symbol: str):
-    try:
-        ticker = yf.Ticker(symbol)
-        balance_sheet = ticker.balance_sheet
-
-        if balance_sheet is None or balance_sheet.empty:
-            raise HTTPException(status_code=404, detail="No balance sheet data found for this symbol")
-
-        balance_sheet.index = balance_sheet.index.astype(str)
-        balance_sheet.columns = balance_sheet.columns.astype(str)
-
-        cleaned = balance_sheet.replace({np.nan: None, np.inf: None, -np.inf: None})
-        return {"balance_sheet": cleaned.to_dict()}
-    except Exception as e:
-        print(f"[ERROR] Failed to fetch balance sheet for {symbol}: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
+    return load_section("balance-sheet", market_data.ticker(symbol))
 
 
 @router.get("/cashflow/{symbol}")
+@cached_upstream("cashflow")
 def get_cashflow(symbol: str):
-    try:
-        ticker = yf.Ticker(symbol)
-        cashflow = ticker.cashflow
-
-        if cashflow is None or cashflow.empty:
-            raise HTTPException(status_code=404, detail="No cash flow data found for this symbol")
+    return load_section("cashflow", market_data.ticker(symbol))
 
-        cashflow.index = cashflow.index.astype(str)
-        cashflow.columns = cashflow.columns.astype(str)
-
-        cleaned = cashflow.replace({np.nan: None, np.inf: None, -np.inf: None})
-        return {"cashflow": cleaned.to_dict()}
-    except Exception as e:
-        print(f"[ERROR] Failed to fetch cashflow for {symbol}: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/sustainability/{symbol}")
+@cached_upstream("sustainability")
 def get_sustainability(symbol: str):
-    try:
-        ticker = yf.Ticker(symbol)
-        sustainability = ticker.sustainability
+    return load_section("sustainability", market_data.ticker(symbol))
 
-        if sustainability is None or sustainability.empty:
-            raise HTTPException(status_code=404, detail="No sustainability data found for this symbol")
-
-        sustainability.index = sustainability.index.astype(str)
-        cleaned = sustainability.replace({np.nan: None, np.inf: None, -np.inf: None})
-        return {"sustainability": cleaned.to_dict()}
-    except Exception as e:
-        print(f"[ERROR] Failed to fetch sustainability data for {symbol}: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/recommendations/{symbol}")
+@cached_upstream("recommendations")
 def get_recommendations(symbol: str):
-    try:
-        ticker = yf.Ticker(symbol)
-        recommendations = ticker.recommendations
+    return load_section("recommendations", market_data.ticker(symbol))
 
-        if recommendations is None or recommendations.empty:
-            raise HTTPException(status_code=404, detail="No recommendation data found for this symbol")
-
-        recommendations.index = recommendations.index.astype(str)
-        cleaned = recommendations.replace({np.nan: None, np.inf: None, -np.inf: None})
-        return {"recommendations": cleaned.to_dict(orient="records")}
-    except Exception as e:
-        print(f"[ERROR] Failed to fetch recommendations for {symbol}: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/calendar/{symbol}")
+@cached_upstream("calendar")
 def get_calendar(symbol: str):
-    try:
-        ticker = yf.Ticker(symbol)
-        calendar_raw = ticker.calendar
-
-        if calendar_raw is None:
-            raise HTTPException(status_code=404, detail="No calendar data found")
-
-        # Convert DataFrame to dict or use dict as-is
-        if isinstance(calendar_raw, pd.DataFrame):
-            calendar_dict = calendar_raw.to_dict()
-            # Flatten: take first value from Series
-            calendar = {
-                key: (value[0] if isinstance(value, (pd.Series, list)) else value)
-                for key, value in calendar_dict.items()
-            }
-        elif isinstance(calendar_raw, dict):
-            calendar = calendar_raw
-        else:
-            raise HTTPException(status_code=500, detail="Unexpected calendar format")
-
-        # Normalize NaN
-        cleaned = {
-            k: (None if pd.isna(v) else v)
-            for k, v in calendar.items()
-        }
+    return load_section("calendar", market_data.ticker(symbol))
 
-        return {"calendar": cleaned}
-
-    except Exception as e:
-        print(f"[ERROR] calendar fetch failed for {symbol}: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/options/{symbol}")
+@cached_upstream("options")
 def get_options_expirations(symbol: str):
-    try:
-        ticker = yf.Ticker(symbol)
-        expirations = ticker.options
-
-        if not expirations:
-            raise HTTPException(status_code=404, detail="No options expirations found")
+    return load_section("options", market_data.ticker(symbol))
 
-        return {"expirations": expirations}
-    except Exception as e:
-        print(f"[ERROR] options expirations fetch failed for {symbol}: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/isin/{symbol}")
+@cached_upstream("isin")
 def get_isin(symbol: str):
-    try:
-        ticker = yf.Ticker(symbol)
-        isin = ticker.isin
-
-        if not isin:
-            raise HTTPException(status_code=404, detail="ISIN not available")
+    return load_section("isin", market_data.ticker(symbol))
 
-        return {"symbol": symbol.upper(), "isin": isin}
-    except Exception as e:
-        print(f"[ERROR] Failed to fetch ISIN for {symbol}: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/news/{symbol}")
+@cached_upstream("news")
 def get_news(symbol: str):
-    try:
-        ticker = yf.Ticker(symbol)
-        news = ticker.news
-
-        if not news:
-            raise HTTPException(status_code=404, detail="No news found")
+    return load_section("news", market_data.ticker(symbol))
 
-        return {"symbol": symbol.upper(), "news": news}
-    except Exception as e:
-        print(f"[ERROR] Failed to fetch news for {symbol}: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/major-holders/{symbol}")
+@cached_upstream("major-holders")
 def get_major_holders(symbol: str):
-    try:
-        ticker = yf.Ticker(symbol)
-        df = ticker.major_holders
-
-        if df is None or df.empty:
-            raise HTTPException(status_code=404, detail="No major holders found")
+    return load_section("major-holders", market_data.ticker(symbol))
 
-        # Convertim într-o listă de perechi (label, valoare)
-        result = df.reset_index().values.tolist()
-        return {"symbol": symbol.upper(), "major_holders": result}
-
-    except Exception as e:
-        print(f"[ERROR] Failed to fetch major holders for {symbol}: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/institutional-holders/{symbol}")
+@cached_upstream("institutional-holders")
 def get_institutional_holders(symbol: str):
-    try:
-        ticker = yf.Ticker(symbol)
-        df = ticker.institutional_holders
+    return load_section("institutional-holders", market_data.ticker(symbol))
 
-        if df is None or df.empty:
-            raise HTTPException(status_code=404, detail="No institutional holders data found")
-
-        df = df.replace({np.nan: None})
-        df = df.reset_index(drop=True)
-
-        return df.to_dict(orient="records")
-
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/mutualfund-holders/{symbol}")
+@cached_upstream("mutualfund-holders")
 def get_mutualfund_holders(symbol: str):
-    try:
-        ticker = yf.Ticker(symbol)
-        df = ticker.mutualfund_holders
-
-        if df is None or df.empty:
-            raise HTTPException(status_code=404, detail="No mutual fund holders data found")
-
-        df = df.replace({np.nan: None})
-        df = df.reset_index(drop=True)
+    return load_section("mutualfund-holders", market_data.ticker(symbol))
 
-        return df.to_dict(orient="records")
-
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/sectors")
 def get_all_sectors():
@@ -432,11 +426,14 @@ def get_all_sectors():
     return {"sectors": sectors_keys}
 
 @router.get("/sectors/{sector}/industries")
+@cached_upstream("sector-industries")
 def get_industries_by_sector(sector: str):
     try:
-        industries = yf.Sector(sector).industries
+        industries = upstream_client.call(market_data.sector_industries, sector)
         return {"sector": sector, "industries": industries}
     except Exception as e:
+        if is_rate_limited(e):
+            raise _no_data(str(e))
         raise HTTPException(status_code=500, detail=str(e))
 
 
@@ -1,14 +1,30 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from app.api import gics_router, instrument_router, \
     instrument_filters_router, autocomplete_router, \
     yahoo_finance_router
+from app.services.gics_service import get_gics_model
+from app.services.history_store import history_compactor
 
-app = FastAPI(title="Finance Bot API")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Static GICS taxonomy: build lookups and serialized payloads once
+    try:
+        get_gics_model()
+    except FileNotFoundError as e:
+        print(f"[WARN] GICS data not preloaded: {e}")
+    # Folds history delta segments into the monthly partitions
+    history_compactor.start()
+    yield
+    history_compactor.stop()
+
+app = FastAPI(title="Finance Bot API", lifespan=lifespan)
 
 app.include_router(gics_router.router,  prefix="/gics", tags=["GICS"])
+# Before instrument_router, so /instruments/search is not taken for /{instrument_type}
+app.include_router(autocomplete_router.router, prefix="/instruments", tags=["Autocomplet Instruments"])
 app.include_router(instrument_router.router, prefix="/instruments", tags=["Instruments"])
 app.include_router(instrument_filters_router.router, prefix="/instruments", tags=["Instrument Filters"])
-app.include_router(autocomplete_router.router, prefix="/instruments", tags=["Autocomplet Instruments"])
 app.include_router(yahoo_finance_router.router, prefix="/yf", tags=["Historical Data from yfinance"])
 
 @app.get("/")
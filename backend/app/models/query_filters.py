@@ -1,6 +1,22 @@
-from typing import Optional
+from typing import NamedTuple, Optional, Tuple
 from pydantic import BaseModel
 
+# Filter values may carry an operator prefix: "eq:NYQ", "in:USD,EUR",
+# "prefix:App", "contains:bank", "gte:Mid Cap". A bare value means "contains".
+FILTER_OPERATORS = ("eq", "in", "prefix", "contains", "gt", "gte", "lt", "lte")
+ORDERED_OPERATORS = ("gt", "gte", "lt", "lte")
+
+# Fields whose values have a natural order, smallest first
+ORDERED_FIELD_VALUES = {
+    "market_cap": ["Nano Cap", "Micro Cap", "Small Cap", "Mid Cap", "Large Cap", "Mega Cap"],
+}
+
+# One parsed query filter, e.g. FilterCondition("exchange", "in", ("NYQ", "NMS"))
+class FilterCondition(NamedTuple):
+    field: str
+    op: str
+    values: Tuple[str, ...]
+
 # Common base class for shared fields across all instruments
 class CommonFilters(BaseModel):
     symbol: Optional[str] = None
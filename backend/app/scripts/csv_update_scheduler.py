@@ -1,83 +1,109 @@
+# Run from backend/: python -m app.scripts.csv_update_scheduler
 from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.triggers.interval import IntervalTrigger
-from pathlib import Path
-import pandas as pd
-import yfinance as yf
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime, timedelta
+from typing import Dict, List
 import time
 import logging
+from app.services.history_service import INTERVAL_WINDOWS, refresh_histories
+from app.services.history_store import history_compactor, history_store
+from app.services.market_data import market_data
+from app.services.refresh_queue import refresh_queue
+from app.services.upstream_client import upstream_client
+import pandas as pd
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("csv_updater")
 
-CACHE_DIR = Path(__file__).parent / ".." / "data" / "yfinance_cache"
-CACHE_DIR.mkdir(parents=True, exist_ok=True)
+# Interval groups refreshed at once; downloads inside a group are batched
+# and bounded by the history service's own download pool
+GROUP_WORKERS = 4
+# Due series refreshed per pass; the rest stay queued, most overdue first
+MAX_SERIES_PER_PASS = 500
+POLL_SECONDS = 15
 
-INTERVAL_WINDOWS = {
-    "1m": timedelta(days=7),
-    "5m": timedelta(days=30),
-    "15m": timedelta(days=60),
-    "30m": timedelta(days=60),
-    "1h": timedelta(days=730),
-    "1d": timedelta(days=3650),
-    "1wk": timedelta(days=3650),
-    "1mo": timedelta(days=3650)
-}
+def update_group(interval: str, symbols: List[str]) -> Dict[str, int]:
+    now = datetime.utcnow()
+    max_window = INTERVAL_WINDOWS.get(interval, timedelta(days=7))
 
-def update_csv(file_path: Path):
-    try:
-        logger.info(f"\n🔄 Checking file: {file_path.name}")
-        symbol, interval_ext = file_path.stem.split("_", 1)
-        interval = interval_ext
-        max_window = INTERVAL_WINDOWS.get(interval, timedelta(days=7))
+    # Keep each stored span complete up to now; back-fills are left to requests
+    starts = {}
+    for symbol in symbols:
+        first = history_store.first_timestamp(symbol, interval)
+        if first is not None:
+            starts[symbol] = max(first, now - max_window)
 
-        df_existing = pd.read_csv(file_path, index_col=0, parse_dates=True)
-        df_existing.index = pd.to_datetime(df_existing.index, errors="coerce")
-        df_existing = df_existing[~df_existing.index.isna()]
+    return refresh_histories(symbols, interval, now - max_window, now, starts=starts)
 
-        last_date = df_existing.index.max()
-        now = datetime.utcnow()
-        fetch_from = last_date + timedelta(minutes=1)
-        fetch_to = now
+def scan_and_update():
+    throttled_for = upstream_client.throttled_for()
+    if throttled_for > 0:
+        # Due series stay queued until Yahoo takes requests again
+        logger.warning(f"⏸️ Upstream rate limited, skipping pass ({throttled_for:.0f}s left)")
+        return
 
-        logger.info(f"⏳ Downloading {symbol} from {fetch_from} to {fetch_to} ({interval})")
-        df_new = yf.download(
-            symbol,
-            start=fetch_from,
-            end=fetch_to,
-            interval=interval,
-            progress=False,
-            threads=False
-        )
+    now = pd.Timestamp.utcnow().tz_localize(None)
+    refresh_queue.sync(history_store.list_series())
+    due = refresh_queue.pop_due(now, MAX_SERIES_PER_PASS)
+    if not due:
+        return
 
-        if df_new is not None and not df_new.empty:
-            df_new.index = pd.to_datetime(df_new.index)
-            df_all = pd.concat([df_existing, df_new])
-            df_all = df_all[~df_all.index.duplicated(keep="last")]
-            df_all.sort_index(inplace=True)
-            df_all.to_csv(file_path)
-            logger.info(f"✅ Updated {file_path.name} with {len(df_new)} new rows")
-        else:
-            logger.info(f"✅ No new data for {symbol} ({interval})")
+    started = time.perf_counter()
+    groups = defaultdict(list)
+    for symbol, interval in due:
+        groups[interval].append(symbol)
 
-    except Exception as e:
-        logger.error(f"❌ Failed to update {file_path.name}: {e}")
+    new_rows = 0
+    failed = 0
+    with ThreadPoolExecutor(max_workers=GROUP_WORKERS, thread_name_prefix="csv-updater") as pool:
+        futures = {pool.submit(update_group, interval, symbols): interval for interval, symbols in groups.items()}
+        for future in as_completed(futures):
+            interval = futures[future]
+            try:
+                updated = future.result()
+            except Exception as e:
+                failed += len(groups[interval])
+                logger.error(f"❌ Failed to update {interval} series: {e}")
+                for symbol in groups[interval]:
+                    refresh_queue.reschedule(symbol, interval, now, failed=True)
+                continue
+            for symbol in groups[interval]:
+                refresh_queue.reschedule(symbol, interval, now)
+            for symbol, rows in updated.items():
+                if rows:
+                    logger.info(f"✅ Updated {symbol} ({interval}) with {rows} new rows")
+            new_rows += sum(updated.values())
 
-def scan_and_update():
-    csv_files = CACHE_DIR.glob("*.csv")
-    for csv_file in csv_files:
-        update_csv(csv_file)
+    elapsed = time.perf_counter() - started
+    next_due = refresh_queue.next_due_at()
+    upstream = upstream_client.stats()
+    logger.info(
+        f"⏱️ Pass done in {elapsed:.1f}s: {len(due)} due series in {len(groups)} interval groups, "
+        f"{new_rows} new rows, {failed} failed ({len(due) / elapsed if elapsed else 0:.1f} series/s, "
+        f"{new_rows / elapsed if elapsed else 0:.0f} rows/s); next due at {next_due}; "
+        f"upstream p95 {upstream['latency']['p95_ms']}ms, {upstream['retries']} retries"
+    )
 
 if __name__ == "__main__":
+    imported = history_store.import_all_legacy_csv()
+    if imported:
+        logger.info(f"📦 Imported {imported} rows from the legacy CSV cache")
+
     scheduler = BackgroundScheduler()
-    scheduler.add_job(scan_and_update, IntervalTrigger(minutes=1))
+    # Passes only refresh due series, so polling often is cheap; a pass that
+    # overruns delays the next one instead of overlapping it
+    scheduler.add_job(scan_and_update, IntervalTrigger(seconds=POLL_SECONDS), max_instances=1, coalesce=True)
     scheduler.start()
+    history_compactor.start()
 
-    logger.info("🚀 CSV auto-updater started. Running every 1 minute...")
+    logger.info(f"🚀 CSV auto-updater started ({market_data.name} data). Checking for due series every {POLL_SECONDS}s...")
 
     try:
         while True:
             time.sleep(60)
     except (KeyboardInterrupt, SystemExit):
         scheduler.shutdown()
+        history_compactor.stop()
         logger.info("🛑 Scheduler stopped.")
@@ -1,7 +1,9 @@
+# Run from backend/: python -m app.scripts.save_all_instruments
 import json
 from financedatabase import Equities, Currencies, Cryptos, ETFs, Funds, Indices, Moneymarkets
 from pathlib import Path
 import numpy as np
+from app.services.binary_catalog import write_catalog
 
 DATA_DIR = Path(__file__).parent.parent / "data"
 DATA_DIR.mkdir(parents=True, exist_ok=True)
@@ -23,6 +25,11 @@ def save_to_json(df, filename):
 
     print(f"✅ Saved {len(df_dict)} entries to {filename}")
 
+    # Compact copy that API workers memory-map instead of parsing the JSON
+    bin_filename = Path(filename).with_suffix(".bin").name
+    write_catalog(DATA_DIR / bin_filename, df_dict)
+    print(f"✅ Saved binary catalog to {bin_filename}")
+
 if __name__ == "__main__":
     instruments = [
         (Equities, "Equities"),
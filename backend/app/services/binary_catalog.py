@@ -0,0 +1,186 @@
+"""
+Binary catalog layout (little-endian, every section 8-byte aligned):
+
+    magic      8 bytes  b"FINCAT01"
+    per column
+        codes    int32[rows]       index into the string table, -1 = null
+        offsets  uint32[size + 1]  start of each string in the blob
+        blob     UTF-8 bytes
+    header     UTF-8 JSON
+               {"rows": n, "columns": [{"name", "size", "codes", "offsets",
+                                        "blob", "blob_size"}, ...]}
+    trailer    uint64 header offset, uint32 header size, magic
+
+The "symbol" column holds the catalog keys, one distinct string per row.
+Readers map the file and wrap the sections with numpy views, so nothing is
+parsed or copied up front and every worker shares the same page cache.
+"""
+
+import json
+import mmap
+import os
+import struct
+from collections.abc import Mapping
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+
+MAGIC = b"FINCAT01"
+_TRAILER = "<QI"
+SYMBOL = "symbol"
+
+
+def _align(n: int) -> int:
+    return (n + 7) & ~7
+
+
+def _encode(values) -> tuple:
+    lookup: Dict[str, int] = {}
+    strings: List[bytes] = []
+    codes = np.empty(len(values), dtype="<i4")
+    for i, value in enumerate(values):
+        if value is None:
+            codes[i] = -1
+            continue
+        value = value if isinstance(value, str) else str(value)
+        code = lookup.get(value)
+        if code is None:
+            code = lookup[value] = len(strings)
+            strings.append(value.encode("utf-8"))
+        codes[i] = code
+
+    offsets = np.zeros(len(strings) + 1, dtype="<u4")
+    if strings:
+        np.cumsum([len(s) for s in strings], out=offsets[1:])
+    return codes, offsets, b"".join(strings)
+
+
+def write_catalog(path: Path, records: dict):
+    """
+    Write ``{symbol: {field: value}}`` as a binary catalog. Values are stored
+    as strings. The file is written aside and renamed into place, so workers
+    that still map the previous version keep a consistent view.
+    """
+    symbols = list(records.keys())
+    fields: List[str] = []
+    for item in records.values():
+        for key in (item or {}):
+            if key != SYMBOL and key not in fields:
+                fields.append(key)
+
+    sections = [(SYMBOL, _encode(symbols))]
+    for field in fields:
+        sections.append((field, _encode([(item or {}).get(field) for item in records.values()])))
+
+    columns = []
+    tmp_path = path.with_suffix(path.suffix + ".tmp")
+    with open(tmp_path, "wb") as f:
+        f.write(MAGIC)
+        for name, (codes, offsets, blob) in sections:
+            column = {"name": name, "size": len(offsets) - 1, "blob_size": len(blob)}
+            for key, chunk in (("codes", codes.tobytes()), ("offsets", offsets.tobytes()), ("blob", blob)):
+                f.write(b"\0" * (_align(f.tell()) - f.tell()))
+                column[key] = f.tell()
+                f.write(chunk)
+            columns.append(column)
+
+        header = json.dumps({"rows": len(symbols), "columns": columns}).encode("utf-8")
+        f.write(b"\0" * (_align(f.tell()) - f.tell()))
+        header_offset = f.tell()
+        f.write(header)
+        f.write(struct.pack(_TRAILER, header_offset, len(header)))
+        f.write(MAGIC)
+    os.replace(tmp_path, path)
+
+
+class StringTable:
+    """Read-only sequence of strings decoded on access from the mapped blob."""
+
+    def __init__(self, buf, offsets: np.ndarray, blob_start: int):
+        self._buf = buf
+        self._offsets = offsets
+        self._blob_start = blob_start
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def __getitem__(self, i: int) -> str:
+        if i < 0:
+            i += len(self)
+        start = self._blob_start + int(self._offsets[i])
+        end = self._blob_start + int(self._offsets[i + 1])
+        return str(self._buf[start:end], "utf-8")
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+
+class BinaryCatalog:
+    def __init__(self, path: Path):
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        footer = len(self._mm) - len(MAGIC) - struct.calcsize(_TRAILER)
+        if footer < len(MAGIC) or self._mm[:len(MAGIC)] != MAGIC or self._mm[-len(MAGIC):] != MAGIC:
+            raise ValueError(f"Not a binary catalog: {path.name}")
+        header_offset, header_size = struct.unpack_from(_TRAILER, self._mm, footer)
+        header = json.loads(self._mm[header_offset:header_offset + header_size])
+
+        self.rows: int = header["rows"]
+        # name -> (codes, string table), both backed by the mapping
+        self.columns: Dict[str, Tuple[np.ndarray, StringTable]] = {}
+        buf = memoryview(self._mm)
+        for meta in header["columns"]:
+            codes = np.frombuffer(self._mm, dtype="<i4", count=self.rows, offset=meta["codes"])
+            offsets = np.frombuffer(self._mm, dtype="<u4", count=meta["size"] + 1, offset=meta["offsets"])
+            self.columns[meta["name"]] = (codes, StringTable(buf, offsets, meta["blob"]))
+
+        self.fields = [name for name in self.columns if name != SYMBOL]
+        self.symbols = self.columns[SYMBOL][1]
+
+    def row(self, pos: int) -> dict:
+        item = {}
+        for field in self.fields:
+            codes, strings = self.columns[field]
+            code = codes[pos]
+            item[field] = strings[code] if code >= 0 else None
+        item[SYMBOL] = self.symbols[pos]
+        return item
+
+
+class MappedCatalog(Mapping):
+    """
+    ``{symbol: record}`` view over a binary catalog, for code that still
+    expects the dict shape returned by ``load_symbols``. Records are built
+    on access.
+    """
+
+    def __init__(self, catalog: BinaryCatalog):
+        self.catalog = catalog
+        self._positions: Optional[Dict[str, int]] = None
+
+    def _index(self) -> Dict[str, int]:
+        if self._positions is None:
+            self._positions = {sym: pos for pos, sym in enumerate(self.catalog.symbols)}
+        return self._positions
+
+    def __getitem__(self, symbol: str) -> dict:
+        return self.catalog.row(self._index()[symbol])
+
+    def __iter__(self):
+        return iter(self.catalog.symbols)
+
+    def __len__(self):
+        return self.catalog.rows
+
+    def items(self):
+        for pos, sym in enumerate(self.catalog.symbols):
+            yield sym, self.catalog.row(pos)
+
+    def values(self):
+        for pos in range(self.catalog.rows):
+            yield self.catalog.row(pos)
+
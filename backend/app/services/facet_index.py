@@ -0,0 +1,87 @@
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+from app.models.query_filters import FilterCondition
+from app.services.instrument_columns import ColumnStore
+from app.services.local_symbol_service import CatalogSnapshot, get_catalog
+from app.services.query_filter_resolver import FILTER_MAP
+
+# Low-cardinality fields of the query_filters models worth a dropdown
+FACET_FIELDS = (
+    "exchange",
+    "country",
+    "market",
+    "market_cap",
+    "currency",
+    "base_currency",
+    "quote_currency",
+    "cryptocurrency",
+    "sector",
+    "industry_group",
+    "industry",
+    "category_group",
+    "category",
+    "family",
+)
+
+
+class FacetIndex:
+    """
+    Distinct values and counts of every facet field of one catalog, built
+    once per catalog load. Counts under filters are a bincount of the column
+    codes selected by a boolean mask, never a rescan of the records.
+    """
+
+    def __init__(self, store: ColumnStore, fields: Iterable[str]):
+        self.store = store
+        self.fields: List[str] = list(fields)
+        self.totals = {field: self._bincount(field, None) for field in self.fields}
+
+    @classmethod
+    def from_snapshot(cls, snapshot: CatalogSnapshot) -> "FacetIndex":
+        model_fields = FILTER_MAP[snapshot.type_key].model_fields
+        fields = [field for field in FACET_FIELDS if field in model_fields]
+        return cls(snapshot.derived("column_store", ColumnStore.from_snapshot), fields)
+
+    def _bincount(self, field: str, mask: Optional[np.ndarray]) -> np.ndarray:
+        column = self.store.column(field)
+        codes = column.codes if mask is None else column.codes[mask]
+        # Shift by one so missing values (-1) land in slot 0
+        return np.bincount(codes + 1, minlength=len(column.categories) + 1)[1:]
+
+    def _values(self, field: str, counts: np.ndarray, limit: Optional[int]) -> List[dict]:
+        categories = self.store.column(field).categories
+        nonzero = np.flatnonzero(counts)
+        order = nonzero[np.argsort(-counts[nonzero], kind="stable")]
+        if limit is not None:
+            order = order[:limit]
+        return [{"value": categories[code], "count": int(counts[code])} for code in order]
+
+    def counts(
+        self,
+        conditions: List[FilterCondition],
+        fields: Optional[Iterable[str]] = None,
+        limit: Optional[int] = None,
+    ) -> Dict[str, List[dict]]:
+        """
+        Facet counts under ``conditions``. A field's own filter is left out when
+        counting that field, so a dropdown keeps listing the alternatives to
+        the current selection.
+        """
+        fields = self.fields if fields is None else [f for f in fields if f in self.fields]
+        masks = self.store.filter_masks(conditions)
+
+        result = {}
+        for field in fields:
+            others = [mask for other, mask in masks.items() if other != field]
+            if others:
+                counts = self._bincount(field, np.logical_and.reduce(others))
+            else:
+                counts = self.totals[field]
+            result[field] = self._values(field, counts, limit)
+        return result
+
+
+def get_facet_index(instrument_type: str) -> FacetIndex:
+    return get_catalog(instrument_type).derived("facet_index", FacetIndex.from_snapshot)
@@ -0,0 +1,170 @@
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Dict, NamedTuple, Optional
+from urllib.parse import quote
+
+from fastapi.encoders import jsonable_encoder
+from starlette.concurrency import run_in_threadpool
+
+from app.services.history_store import STORE_DIR
+from app.services.request_coalescing import single_flight
+
+logger = logging.getLogger("fundamentals")
+
+CACHE_DIR = STORE_DIR / "fundamentals_cache"
+
+MINUTE = 60
+HOUR = 60 * MINUTE
+DAY = 24 * HOUR
+
+# Seconds a cached section counts as fresh
+SECTION_TTLS = {
+    "info": 6 * HOUR,
+    "actions": DAY,
+    "dividends": DAY,
+    "splits": DAY,
+    "financials": 3 * DAY,
+    "balance-sheet": 3 * DAY,
+    "cashflow": 3 * DAY,
+    "sustainability": 7 * DAY,
+    "recommendations": DAY,
+    "calendar": 12 * HOUR,
+    "options": HOUR,
+    "isin": 30 * DAY,
+    "news": 10 * MINUTE,
+    "major-holders": DAY,
+    "institutional-holders": DAY,
+    "mutualfund-holders": DAY,
+    "sector-industries": 7 * DAY,
+}
+DEFAULT_TTL = HOUR
+
+# Past its TTL, an entry is still served (and refreshed behind the caller) for this long
+MAX_STALE = 7 * DAY
+MAX_ENTRIES = 2048
+
+
+class CacheEntry(NamedTuple):
+    fetched_at: float
+    value: Any
+
+
+class FundamentalsCache:
+    """
+    Cache for yfinance per-symbol sections (info, statements, holders, ...).
+
+    Entries live in a bounded in-memory LRU and as one JSON file per entry
+    under ``root/{section}/``, so they survive restarts and are shared by
+    workers. Fresh entries are returned as is. Stale ones are returned
+    immediately while a single background refresh runs; past MAX_STALE the
+    caller waits for the refresh (and still gets the old copy if it fails).
+    """
+
+    def __init__(self, root: Path = CACHE_DIR, max_entries: int = MAX_ENTRIES):
+        self.root = root
+        self.max_entries = max_entries
+        self._memory: "OrderedDict[tuple, CacheEntry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._background = set()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.refresh_errors = 0
+
+    def _path(self, section: str, key: str) -> Path:
+        return self.root / section / f"{quote(key, safe='')}.json"
+
+    def _remember(self, memory_key: tuple, entry: CacheEntry):
+        with self._lock:
+            self._memory[memory_key] = entry
+            self._memory.move_to_end(memory_key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+
+    def lookup(self, section: str, key: str) -> Optional[CacheEntry]:
+        with self._lock:
+            entry = self._memory.get((section, key))
+            if entry is not None:
+                self._memory.move_to_end((section, key))
+                return entry
+        try:
+            with open(self._path(section, key), "r") as f:
+                stored = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+        entry = CacheEntry(stored["fetched_at"], stored["value"])
+        self._remember((section, key), entry)
+        return entry
+
+    def store(self, section: str, key: str, value: Any) -> Any:
+        value = jsonable_encoder(value)
+        entry = CacheEntry(time.time(), value)
+        path = self._path(section, key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f".{path.name}.{uuid.uuid4().hex}.tmp")
+        with open(tmp_path, "w") as f:
+            json.dump({"fetched_at": entry.fetched_at, "value": value}, f)
+        os.replace(tmp_path, path)
+        self._remember((section, key), entry)
+        return value
+
+    def is_fresh(self, section: str, entry: Optional[CacheEntry]) -> bool:
+        return entry is not None and time.time() - entry.fetched_at < SECTION_TTLS.get(section, DEFAULT_TTL)
+
+    async def _refresh(self, section: str, key: str, loader: Callable[[], Any]) -> Any:
+        def load_and_store():
+            return self.store(section, key, loader())
+        # Concurrent misses and background refreshes of one entry share a fetch
+        return await single_flight.do((section, key), load_and_store)
+
+    async def _refresh_in_background(self, section: str, key: str, loader: Callable[[], Any]):
+        try:
+            await self._refresh(section, key, loader)
+        except Exception as e:
+            self.refresh_errors += 1
+            logger.warning(f"Background refresh of {section} for {key} failed: {e}")
+
+    async def get(self, section: str, key: str, loader: Callable[[], Any]) -> Any:
+        """Cached value of ``section`` for ``key``; ``loader`` is the blocking upstream fetch."""
+        entry = await run_in_threadpool(self.lookup, section, key)
+        age = time.time() - entry.fetched_at if entry is not None else None
+        ttl = SECTION_TTLS.get(section, DEFAULT_TTL)
+
+        if age is not None and age < ttl:
+            self.hits += 1
+            return entry.value
+        if age is not None and age < ttl + MAX_STALE:
+            self.stale_hits += 1
+            task = asyncio.ensure_future(self._refresh_in_background(section, key, loader))
+            self._background.add(task)
+            task.add_done_callback(self._background.discard)
+            return entry.value
+
+        self.misses += 1
+        try:
+            return await self._refresh(section, key, loader)
+        except Exception:
+            if entry is None:
+                raise
+            self.refresh_errors += 1
+            return entry.value
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "memory_entries": len(self._memory),
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "refresh_errors": self.refresh_errors,
+            "background_refreshes": len(self._background),
+        }
+
+
+fundamentals_cache = FundamentalsCache()
@@ -0,0 +1,199 @@
+import logging
+from typing import Any, Callable, Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+from fastapi import HTTPException
+
+from app.services.market_data import TickerLike, market_data
+from app.services.upstream_client import is_rate_limited, upstream_client
+
+logger = logging.getLogger("fundamentals")
+
+
+def _not_found(detail: str):
+    raise HTTPException(status_code=404, detail=detail)
+
+
+def _clean(df: pd.DataFrame) -> pd.DataFrame:
+    return df.replace({np.nan: None, np.inf: None, -np.inf: None})
+
+
+def load_info(ticker: TickerLike):
+    info = ticker.info
+    if not info:
+        _not_found("No information found for this symbol.")
+    return info
+
+
+def load_actions(ticker: TickerLike):
+    actions = ticker.actions
+    if actions is None or actions.empty:
+        _not_found("No corporate actions found for this symbol")
+    actions.index = actions.index.astype(str)
+    return {"actions": actions.to_dict(orient="index")}
+
+
+def load_dividends(ticker: TickerLike):
+    dividends = ticker.dividends
+    if dividends is None or dividends.empty:
+        _not_found("No dividends found for this symbol")
+    dividends.index = dividends.index.astype(str)
+    return {"dividends": dividends.to_dict()}
+
+
+def load_splits(ticker: TickerLike):
+    splits = ticker.splits
+    if splits is None or splits.empty:
+        _not_found("No splits found for this symbol")
+    splits.index = splits.index.astype(str)
+    return {"splits": splits.to_dict()}
+
+
+def _statement(name: str, label: str) -> Callable[[TickerLike], dict]:
+    # financials, balance_sheet and cashflow share one shape: line items x periods
+    def load(ticker: TickerLike):
+        df = getattr(ticker, name)
+        if df is None or df.empty:
+            _not_found(f"No {label} data found for this symbol")
+        df.index = df.index.astype(str)
+        df.columns = df.columns.astype(str)
+        return {name: _clean(df).to_dict()}
+    return load
+
+
+def load_sustainability(ticker: TickerLike):
+    sustainability = ticker.sustainability
+    if sustainability is None or sustainability.empty:
+        _not_found("No sustainability data found for this symbol")
+    sustainability.index = sustainability.index.astype(str)
+    return {"sustainability": _clean(sustainability).to_dict()}
+
+
+def load_recommendations(ticker: TickerLike):
+    recommendations = ticker.recommendations
+    if recommendations is None or recommendations.empty:
+        _not_found("No recommendation data found for this symbol")
+    recommendations.index = recommendations.index.astype(str)
+    return {"recommendations": _clean(recommendations).to_dict(orient="records")}
+
+
+def load_calendar(ticker: TickerLike):
+    calendar_raw = ticker.calendar
+    if calendar_raw is None:
+        _not_found("No calendar data found")
+
+    # Convert DataFrame to dict or use dict as-is
+    if isinstance(calendar_raw, pd.DataFrame):
+        calendar_dict = calendar_raw.to_dict()
+        # Flatten: take first value from Series
+        calendar = {
+            key: (value[0] if isinstance(value, (pd.Series, list)) else value)
+            for key, value in calendar_dict.items()
+        }
+    elif isinstance(calendar_raw, dict):
+        calendar = calendar_raw
+    else:
+        raise HTTPException(status_code=500, detail="Unexpected calendar format")
+
+    # Normalize NaN
+    cleaned = {
+        k: (None if pd.isna(v) else v)
+        for k, v in calendar.items()
+    }
+    return {"calendar": cleaned}
+
+
+def load_options(ticker: TickerLike):
+    expirations = ticker.options
+    if not expirations:
+        _not_found("No options expirations found")
+    return {"expirations": expirations}
+
+
+def load_isin(ticker: TickerLike):
+    isin = ticker.isin
+    if not isin:
+        _not_found("ISIN not available")
+    return {"symbol": ticker.ticker, "isin": isin}
+
+
+def load_news(ticker: TickerLike):
+    news = ticker.news
+    if not news:
+        _not_found("No news found")
+    return {"symbol": ticker.ticker, "news": news}
+
+
+def load_major_holders(ticker: TickerLike):
+    df = ticker.major_holders
+    if df is None or df.empty:
+        _not_found("No major holders found")
+    # List of (label, value) pairs
+    return {"symbol": ticker.ticker, "major_holders": df.reset_index().values.tolist()}
+
+
+def _holders(name: str, label: str) -> Callable[[TickerLike], list]:
+    def load(ticker: TickerLike):
+        df = getattr(ticker, name)
+        if df is None or df.empty:
+            _not_found(f"No {label} data found")
+        df = df.replace({np.nan: None})
+        return df.reset_index(drop=True).to_dict(orient="records")
+    return load
+
+
+# Section name (as in the /yf/{section}/{symbol} routes) -> loader taking a provider ticker
+SECTION_LOADERS: Dict[str, Callable[[TickerLike], Any]] = {
+    "info": load_info,
+    "actions": load_actions,
+    "dividends": load_dividends,
+    "splits": load_splits,
+    "financials": _statement("financials", "financial"),
+    "balance-sheet": _statement("balance_sheet", "balance sheet"),
+    "cashflow": _statement("cashflow", "cash flow"),
+    "sustainability": load_sustainability,
+    "recommendations": load_recommendations,
+    "calendar": load_calendar,
+    "options": load_options,
+    "isin": load_isin,
+    "news": load_news,
+    "major-holders": load_major_holders,
+    "institutional-holders": _holders("institutional_holders", "institutional holders"),
+    "mutualfund-holders": _holders("mutualfund_holders", "mutual fund holders"),
+}
+
+
+def load_section(section: str, ticker: TickerLike):
+    """
+    Run one section loader through the upstream client. Missing data stays
+    a 404, throttling that outlasted the retries is a 503, and any other
+    failure becomes a 500 carrying the upstream error.
+    """
+    try:
+        return upstream_client.call(SECTION_LOADERS[section], ticker)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Failed to fetch {section} for {ticker.ticker}: {e}")
+        if is_rate_limited(e):
+            retry_after = max(1, round(upstream_client.throttled_for()))
+            raise HTTPException(status_code=503, detail="Upstream rate limit, retry later",
+                                headers={"Retry-After": str(retry_after)})
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+def load_sections(symbol: str, sections: List[str]) -> Dict[str, Tuple[bool, Any]]:
+    """
+    Load several sections of one symbol through a single provider ticker, so they
+    share its session and already fetched quote data. Returns section ->
+    (True, payload) or (False, HTTPException).
+    """
+    ticker = market_data.ticker(symbol)
+    results = {}
+    for section in sections:
+        try:
+            results[section] = (True, load_section(section, ticker))
+        except HTTPException as e:
+            results[section] = (False, e)
+    return results
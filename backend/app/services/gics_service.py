@@ -1,20 +1,202 @@
+import hashlib
 import json
+from bisect import bisect_left, bisect_right
 from pathlib import Path
-from typing import Optional, Dict
+from typing import Optional, Dict, List
 from functools import lru_cache
 
 
 GICS_FILE = Path(__file__).parent.parent / "data" / "gics.json"
 
+# level -> (code field, name field); codes nest by prefix: 2/4/6/8 digits
+LEVELS = {
+    "sector": ("sector_code", "sector_name"),
+    "industry_group": ("industry_group_code", "industry_group_name"),
+    "industry": ("industry_code", "industry_name"),
+    "sub_industry": ("sub_industry_code", "sub_industry_name"),
+}
+
+
+class Payload:
+    """A response body serialized once, with its ETag."""
+
+    def __init__(self, content):
+        self.content = content
+        self.body = json.dumps(content).encode("utf-8")
+        self.etag = '"' + hashlib.sha1(self.body).hexdigest() + '"'
+
+
+class GicsModel:
+    """
+    The GICS taxonomy loaded once: code- and name-keyed lookups per level,
+    and the sector list and hierarchy already serialized. Because codes nest
+    by prefix, the rows under any sector/group/industry form one contiguous
+    range once sorted by sub-industry code.
+    """
+
+    def __init__(self, rows: List[dict]):
+        self.rows = rows
+        self._sorted = sorted(rows, key=lambda item: str(item["sub_industry_code"]))
+        self._sub_codes = [str(item["sub_industry_code"]) for item in self._sorted]
+
+        # level -> code -> name, and level -> lowercased name -> [codes]
+        self.by_code: Dict[str, Dict[str, str]] = {level: {} for level in LEVELS}
+        self.by_name: Dict[str, Dict[str, List[str]]] = {level: {} for level in LEVELS}
+        for item in self.rows:
+            for level, (code_field, name_field) in LEVELS.items():
+                code, name = str(item[code_field]), item[name_field]
+                if code not in self.by_code[level]:
+                    self.by_code[level][code] = name
+                    self.by_name[level].setdefault(name.lower(), []).append(code)
+
+        self.industry_to_group = {
+            item["industry_name"]: item["industry_group_name"] for item in self.rows
+        }
+        self.sectors = Payload({"sectors": sorted(set(self.by_code["sector"].values()))})
+        self.hierarchy = Payload(self._build_hierarchy())
+
+    def rows_under(self, code_prefix: str) -> List[dict]:
+        lo = bisect_left(self._sub_codes, code_prefix)
+        hi = bisect_right(self._sub_codes, code_prefix + "\uffff")
+        return self._sorted[lo:hi]
+
+    def codes_matching(self, level: str, value: str) -> List[str]:
+        value = value.lower()
+        return [
+            code
+            for name, codes in self.by_name[level].items() if value in name
+            for code in codes
+        ]
+
+    def filter(
+        self,
+        filter_type: str,
+        sector: Optional[str],
+        industry_group: Optional[str],
+        industry: Optional[str],
+        sub_industry: Optional[str],
+    ) -> Payload:
+        if filter_type not in LEVELS:
+            return Payload({"error": f"Invalid filter_type '{filter_type}'. Must be one of: {list(LEVELS.keys())}"})
+
+        selections = {
+            "sector": sector,
+            "industry_group": industry_group,
+            "industry": industry,
+            "sub_industry": sub_industry,
+        }
+        selections = {
+            level: value for level, value in selections.items()
+            if value is not None and value.lower() != "all"
+        }
+
+        # Narrow to the code ranges of the most selective level, then check the rest
+        if selections:
+            level, value = next(reversed(selections.items()))
+            candidates = [
+                item
+                for code in self.codes_matching(level, value)
+                for item in self.rows_under(code)
+            ]
+        else:
+            candidates = self.rows
+
+        def matches(item: dict) -> bool:
+            return all(
+                value.lower() in item[LEVELS[level][1]].lower()
+                for level, value in selections.items()
+            )
+
+        code_field, name_field = LEVELS[filter_type]
+        seen = set()
+        values = []
+        for item in candidates:
+            key = (item[code_field], item[name_field])
+            if key not in seen and matches(item):
+                seen.add(key)
+                values.append({"code": item[code_field], "name": item[name_field]})
+
+        return Payload({
+            "type": filter_type,
+            "values": sorted(values, key=lambda x: x["name"]),
+            "count": len(values)
+        })
+
+    def _build_hierarchy(self) -> list:
+        hierarchy = {}
+
+        for item in self.rows:
+            sec_code, sec_name = item["sector_code"], item["sector_name"]
+            grp_code, grp_name = item["industry_group_code"], item["industry_group_name"]
+            ind_code, ind_name = item["industry_code"], item["industry_name"]
+            sub_code, sub_name = item["sub_industry_code"], item["sub_industry_name"]
+
+            sec = hierarchy.setdefault(sec_code, {
+                "code": sec_code, "name": sec_name, "industry_groups": {}
+            })
+            grp = sec["industry_groups"].setdefault(grp_code, {
+                "code": grp_code, "name": grp_name, "industries": {}
+            })
+            ind = grp["industries"].setdefault(ind_code, {
+                "code": ind_code, "name": ind_name, "sub_industries": []
+            })
+            ind["sub_industries"].append({"code": sub_code, "name": sub_name})
+
+        # Convert dict to list recursively
+        return [
+            {
+                "code": sec["code"],
+                "name": sec["name"],
+                "industry_groups": [
+                    {
+                        "code": grp["code"],
+                        "name": grp["name"],
+                        "industries": [
+                            {
+                                "code": ind["code"],
+                                "name": ind["name"],
+                                "sub_industries": ind["sub_industries"]
+                            } for ind in grp["industries"].values()
+                        ]
+                    } for grp in sec["industry_groups"].values()
+                ]
+            }
+            for sec in hierarchy.values()
+        ]
+
+
 def load_gics():
     with open(GICS_FILE, "r") as f:
         return json.load(f)
 
+
+@lru_cache()
+def get_gics_model() -> GicsModel:
+    return GicsModel(load_gics())
+
+
+def get_all_sectors_payload() -> Payload:
+    return get_gics_model().sectors
+
+
+def get_gics_hierarchy_payload() -> Payload:
+    return get_gics_model().hierarchy
+
+
+@lru_cache(maxsize=1024)
+def filter_gics_payload(
+    filter_type: str,
+    sector: Optional[str],
+    industry_group: Optional[str],
+    industry: Optional[str],
+    sub_industry: Optional[str],
+) -> Payload:
+    return get_gics_model().filter(filter_type, sector, industry_group, industry, sub_industry)
+
+
 def get_all_sectors():
-    with open(GICS_FILE, "r") as f:
-        gics_data = json.load(f)
-    sectors = sorted(set(item["sector_name"] for item in gics_data))
-    return {"sectors": sectors}
+    return get_all_sectors_payload().content
+
 
 def filter_gics_data(
     filter_type: str,
@@ -23,96 +205,12 @@ def filter_gics_data(
     industry: Optional[str],
     sub_industry: Optional[str],
 ):
-    gics_data = load_gics()
-
-    def matches(value: Optional[str], target: str) -> bool:
-        if value is None or value.lower() == "all":
-            return True
-        return value.lower() in target.lower()
-
-    filtered = [
-        item for item in gics_data
-        if matches(sector, item["sector_name"])
-        and matches(industry_group, item["industry_group_name"])
-        and matches(industry, item["industry_name"])
-        and matches(sub_industry, item["sub_industry_name"])
-    ]
-
-    filter_map = {
-        "sector": ("sector_code", "sector_name"),
-        "industry_group": ("industry_group_code", "industry_group_name"),
-        "industry": ("industry_code", "industry_name"),
-        "sub_industry": ("sub_industry_code", "sub_industry_name"),
-    }
-
-    if filter_type not in filter_map:
-        return {"error": f"Invalid filter_type '{filter_type}'. Must be one of: {list(filter_map.keys())}"}
-
-    code_field, name_field = filter_map[filter_type]
-
-    seen = set()
-    values = []
-    for item in filtered:
-        key = (item[code_field], item[name_field])
-        if key not in seen:
-            seen.add(key)
-            values.append({"code": item[code_field], "name": item[name_field]})
-
-    return {
-        "type": filter_type,
-        "values": sorted(values, key=lambda x: x["name"]),
-        "count": len(values)
-    }
+    return filter_gics_payload(filter_type, sector, industry_group, industry, sub_industry).content
 
 
 def get_gics_hierarchy():
-    gics_data = load_gics()
-    hierarchy = {}
+    return get_gics_hierarchy_payload().content
 
-    for item in gics_data:
-        sec_code, sec_name = item["sector_code"], item["sector_name"]
-        grp_code, grp_name = item["industry_group_code"], item["industry_group_name"]
-        ind_code, ind_name = item["industry_code"], item["industry_name"]
-        sub_code, sub_name = item["sub_industry_code"], item["sub_industry_name"]
 
-        sec = hierarchy.setdefault(sec_code, {
-            "code": sec_code, "name": sec_name, "industry_groups": {}
-        })
-        grp = sec["industry_groups"].setdefault(grp_code, {
-            "code": grp_code, "name": grp_name, "industries": {}
-        })
-        ind = grp["industries"].setdefault(ind_code, {
-            "code": ind_code, "name": ind_name, "sub_industries": []
-        })
-        ind["sub_industries"].append({"code": sub_code, "name": sub_name})
-
-    # Convert dict to list recursively
-    return [
-        {
-            "code": sec["code"],
-            "name": sec["name"],
-            "industry_groups": [
-                {
-                    "code": grp["code"],
-                    "name": grp["name"],
-                    "industries": [
-                        {
-                            "code": ind["code"],
-                            "name": ind["name"],
-                            "sub_industries": ind["sub_industries"]
-                        } for ind in grp["industries"].values()
-                    ]
-                } for grp in sec["industry_groups"].values()
-            ]
-        }
-        for sec in hierarchy.values()
-    ]
-
-
-@lru_cache()
 def get_industry_to_group_map() -> Dict[str, str]:
-    gics_data = load_gics()
-    mapping = {}
-    for item in gics_data:
-        mapping[item["industry_name"]] = item["industry_group_name"]
-    return mapping
\ No newline at end of file
+    return get_gics_model().industry_to_group
@@ -0,0 +1,115 @@
+import json
+import os
+import uuid
+from typing import Iterable, List, Optional, Tuple
+
+import pandas as pd
+
+from app.services.history_store import HistoryStore, file_lock, history_store
+
+COVERAGE_FILE = "coverage.json"
+
+# Gaps shorter than this are never worth an upstream call
+MIN_GAP = pd.Timedelta(minutes=1)
+
+Range = Tuple[pd.Timestamp, pd.Timestamp]
+
+
+def merge_ranges(ranges: Iterable[Range]) -> List[Range]:
+    """Sort half-open [start, end) ranges and merge the touching ones."""
+    merged: List[Range] = []
+    for start, end in sorted((pd.Timestamp(s), pd.Timestamp(e)) for s, e in ranges):
+        if start >= end:
+            continue
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def missing_ranges(covered: List[Range], start, end) -> List[Range]:
+    """Sub-ranges of [start, end) outside the merged ``covered`` ranges."""
+    start, end = pd.Timestamp(start), pd.Timestamp(end)
+    gaps = []
+    cursor = start
+    for range_start, range_end in covered:
+        if range_end <= cursor:
+            continue
+        if range_start >= end:
+            break
+        if range_start > cursor:
+            gaps.append((cursor, range_start))
+        cursor = max(cursor, range_end)
+    if cursor < end:
+        gaps.append((cursor, end))
+    return [(s, e) for s, e in gaps if e - s >= MIN_GAP]
+
+
+class CoverageManifest:
+    """
+    Per-series record of the time ranges already fetched from upstream,
+    including the ones that turned out to hold no bars (weekends, holidays):
+
+        {root}/{symbol}_{interval}/coverage.json   [[start, end], ...]
+
+    Series stored before the manifest existed are taken as covering their
+    first to last stored bar. Updates are read-modify-write under a file
+    lock and the file is replaced atomically.
+    """
+
+    def __init__(self, store: HistoryStore):
+        self.store = store
+
+    def _path(self, symbol: str, interval: str):
+        return self.store.series_dir(symbol, interval) / COVERAGE_FILE
+
+    def _read(self, symbol: str, interval: str) -> Optional[List[Range]]:
+        try:
+            with open(self._path(symbol, interval), "r") as f:
+                return merge_ranges(json.load(f))
+        except FileNotFoundError:
+            return None
+
+    def _bootstrap(self, symbol: str, interval: str) -> List[Range]:
+        first = self.store.first_timestamp(symbol, interval)
+        if first is None:
+            return []
+        last = self.store.last_timestamp(symbol, interval)
+        return [(first, last + MIN_GAP)]
+
+    def _write(self, symbol: str, interval: str, ranges: List[Range]):
+        path = self._path(symbol, interval)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f".{path.name}.{uuid.uuid4().hex}.tmp")
+        with open(tmp_path, "w") as f:
+            json.dump([[s.isoformat(), e.isoformat()] for s, e in ranges], f)
+        os.replace(tmp_path, path)
+
+    def covered(self, symbol: str, interval: str) -> List[Range]:
+        ranges = self._read(symbol, interval)
+        return ranges if ranges is not None else self._bootstrap(symbol, interval)
+
+    def ensure(self, symbol: str, interval: str):
+        """
+        Write the manifest of a series that has none yet, before anything is
+        appended: afterwards the stored bars no longer tell what was fetched.
+        """
+        if self._path(symbol, interval).exists():
+            return
+        with file_lock(self._path(symbol, interval).with_name(".coverage.lock")):
+            if self._read(symbol, interval) is None:
+                self._write(symbol, interval, self._bootstrap(symbol, interval))
+
+    def missing(self, symbol: str, interval: str, start, end) -> List[Range]:
+        return missing_ranges(self.covered(symbol, interval), start, end)
+
+    def add(self, symbol: str, interval: str, ranges: Iterable[Range]):
+        ranges = list(ranges)
+        if not ranges:
+            return
+        with file_lock(self._path(symbol, interval).with_name(".coverage.lock")):
+            self._write(symbol, interval, merge_ranges(self.covered(symbol, interval) + ranges))
+
+
+coverage_manifest = CoverageManifest(history_store)
@@ -0,0 +1,99 @@
+import io
+import json
+from typing import Iterator, Optional
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+try:
+    import orjson
+except ImportError:  # Plain json fallback, with NaN/inf turned into null by hand
+    orjson = None
+
+from app.services.history_store import TIMESTAMP
+
+MEDIA_TYPES = {
+    "json": "application/json",
+    "arrow": "application/vnd.apache.arrow.stream",
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+}
+_FORMAT_BY_MEDIA_TYPE = {media_type: name for name, media_type in MEDIA_TYPES.items()}
+
+STREAM_BATCH_SIZE = 5000
+
+
+def negotiate_format(accept: Optional[str], requested: Optional[str] = None) -> str:
+    """An explicit ?format= wins, then the first known media type in Accept, then JSON."""
+    if requested:
+        return requested
+    for part in (accept or "").split(","):
+        name = _FORMAT_BY_MEDIA_TYPE.get(part.split(";")[0].strip().lower())
+        if name:
+            return name
+    return "json"
+
+
+def epoch_ms(index: pd.DatetimeIndex) -> np.ndarray:
+    return np.ascontiguousarray(index.as_unit("ms").asi8)
+
+
+def _json_column(values: np.ndarray) -> list:
+    if values.dtype.kind == "f":
+        return [v if np.isfinite(v) else None for v in values.tolist()]
+    return values.tolist()
+
+
+def dumps(content) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content, option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(content).encode("utf-8")
+
+
+def to_json(bars: pd.DataFrame, **meta) -> bytes:
+    """
+    Column arrays: {**meta, "count", "timestamp": [epoch ms], "data": {column:
+    [values]}}. orjson encodes the numpy arrays directly (NaN/inf as null).
+    """
+    timestamps = epoch_ms(bars.index)
+    # Reversed (ascending) frames hand out strided views, which orjson refuses
+    columns = {col: np.ascontiguousarray(bars[col].to_numpy()) for col in bars.columns}
+    if orjson is None:
+        timestamps = timestamps.tolist()
+        columns = {col: _json_column(values) for col, values in columns.items()}
+    return dumps({**meta, "count": len(bars), "timestamp": timestamps, "data": columns})
+
+
+def to_arrow(bars: pd.DataFrame, **meta) -> bytes:
+    """Arrow IPC stream of one record batch; ``meta`` goes into the schema metadata."""
+    table = pa.Table.from_pandas(bars, preserve_index=True)
+    table = table.replace_schema_metadata({
+        **(table.schema.metadata or {}),
+        **{key.encode(): str(value).encode() for key, value in meta.items()},
+    })
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def iter_csv(bars: pd.DataFrame) -> Iterator[str]:
+    for start in range(0, len(bars), STREAM_BATCH_SIZE):
+        buffer = io.StringIO()
+        bars.iloc[start:start + STREAM_BATCH_SIZE].to_csv(buffer, header=start == 0, index_label=TIMESTAMP)
+        yield buffer.getvalue()
+
+
+def iter_ndjson(bars: pd.DataFrame) -> Iterator[bytes]:
+    """One {"timestamp": epoch ms, column: value, ...} object per line."""
+    timestamps = epoch_ms(bars.index)
+    columns = list(bars.columns)
+    for start in range(0, len(bars), STREAM_BATCH_SIZE):
+        stop = start + STREAM_BATCH_SIZE
+        values = [_json_column(bars[col].to_numpy()[start:stop]) for col in columns]
+        lines = [
+            dumps({TIMESTAMP: ts, **dict(zip(columns, row))})
+            for ts, row in zip(timestamps[start:stop].tolist(), zip(*values))
+        ]
+        yield b"\n".join(lines) + b"\n"
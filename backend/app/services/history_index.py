@@ -0,0 +1,149 @@
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, NamedTuple, Optional
+
+import pandas as pd
+
+INDEX_FILE = "index.sqlite"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS series (
+    symbol TEXT NOT NULL,
+    interval TEXT NOT NULL,
+    first_ts INTEGER,
+    last_ts INTEGER,
+    rows INTEGER NOT NULL DEFAULT 0,
+    bytes INTEGER NOT NULL DEFAULT 0,
+    last_fetch REAL,
+    last_error TEXT,
+    last_error_at REAL,
+    PRIMARY KEY (symbol, interval)
+)
+"""
+_COLUMNS = "symbol, interval, first_ts, last_ts, rows, bytes, last_fetch, last_error, last_error_at"
+
+
+class SeriesMeta(NamedTuple):
+    symbol: str
+    interval: str
+    first_ts: Optional[pd.Timestamp]
+    last_ts: Optional[pd.Timestamp]
+    rows: int
+    bytes: int
+    last_fetch: Optional[float]
+    last_error: Optional[str]
+    last_error_at: Optional[float]
+
+    @classmethod
+    def from_row(cls, row) -> "SeriesMeta":
+        first_ts, last_ts = (pd.Timestamp(value) if value is not None else None for value in row[2:4])
+        return cls(row[0], row[1], first_ts, last_ts, *row[4:])
+
+    def as_dict(self) -> dict:
+        return {
+            **self._asdict(),
+            "first_ts": self.first_ts.isoformat() if self.first_ts is not None else None,
+            "last_ts": self.last_ts.isoformat() if self.last_ts is not None else None,
+        }
+
+
+def _ns(ts: Optional[pd.Timestamp]) -> Optional[int]:
+    return pd.Timestamp(ts).value if ts is not None else None
+
+
+class SeriesIndex:
+    """
+    SQLite table with one row of metadata per stored symbol+interval: first
+    and last bar time, row count, bytes on disk, last upstream fetch and last
+    upstream error. Lookups and updates are single-row statements, so nothing
+    needs to open the series files to know their extent.
+
+    Appends widen the bounds and add their rows (an upper bound, as appended
+    bars may repeat stored ones); compaction stores the recounted figures.
+    WAL mode lets the API workers and the scheduler share the file.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._local = threading.local()
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute(_SCHEMA)
+            self._local.connection = connection
+        return connection
+
+    def get(self, symbol: str, interval: str) -> Optional[SeriesMeta]:
+        row = self._connection().execute(
+            f"SELECT {_COLUMNS} FROM series WHERE symbol = ? AND interval = ?", (symbol, interval)
+        ).fetchone()
+        return SeriesMeta.from_row(row) if row else None
+
+    def get_or_scan(self, symbol: str, interval: str, scan: Callable[[], Dict]) -> SeriesMeta:
+        """Indexed metadata of a series, filled in from ``scan()`` (the files) the first time."""
+        meta = self.get(symbol, interval)
+        if meta is not None:
+            return meta
+        stats = scan()
+        # Another writer may have indexed it meanwhile; its row wins
+        self._connection().execute(
+            "INSERT OR IGNORE INTO series (symbol, interval, first_ts, last_ts, rows, bytes) VALUES (?, ?, ?, ?, ?, ?)",
+            (symbol, interval, _ns(stats["first_ts"]), _ns(stats["last_ts"]), stats["rows"], stats["bytes"]),
+        )
+        return self.get(symbol, interval)
+
+    def all(self) -> List[SeriesMeta]:
+        rows = self._connection().execute(f"SELECT {_COLUMNS} FROM series ORDER BY symbol, interval").fetchall()
+        return [SeriesMeta.from_row(row) for row in rows]
+
+    def record_append(self, symbol: str, interval: str, first_ts, last_ts, rows: int, size: int):
+        self._connection().execute(
+            """
+            INSERT INTO series (symbol, interval, first_ts, last_ts, rows, bytes) VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT (symbol, interval) DO UPDATE SET
+                first_ts = coalesce(min(first_ts, excluded.first_ts), excluded.first_ts),
+                last_ts = coalesce(max(last_ts, excluded.last_ts), excluded.last_ts),
+                rows = rows + excluded.rows,
+                bytes = bytes + excluded.bytes
+            """,
+            (symbol, interval, _ns(first_ts), _ns(last_ts), rows, size),
+        )
+
+    def record_stats(self, symbol: str, interval: str, stats: Dict):
+        """
+        Take the counts computed from the files. Bounds only ever widen, so
+        an append that raced the scan keeps its bars' times.
+        """
+        self._connection().execute(
+            """
+            INSERT INTO series (symbol, interval, first_ts, last_ts, rows, bytes) VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT (symbol, interval) DO UPDATE SET
+                first_ts = coalesce(min(first_ts, excluded.first_ts), excluded.first_ts),
+                last_ts = coalesce(max(last_ts, excluded.last_ts), excluded.last_ts),
+                rows = excluded.rows, bytes = excluded.bytes
+            """,
+            (symbol, interval, _ns(stats["first_ts"]), _ns(stats["last_ts"]), stats["rows"], stats["bytes"]),
+        )
+
+    def record_fetch(self, symbol: str, interval: str, error: Optional[str] = None, at: Optional[float] = None):
+        """
+        A fetch attempt on an indexed series: successful ones set
+        ``last_fetch``, failed ones ``last_error``.
+        """
+        at = time.time() if at is None else at
+        if error is None:
+            self._connection().execute(
+                "UPDATE series SET last_fetch = ? WHERE symbol = ? AND interval = ?", (at, symbol, interval)
+            )
+        else:
+            self._connection().execute(
+                "UPDATE series SET last_error = ?, last_error_at = ? WHERE symbol = ? AND interval = ?",
+                (error, at, symbol, interval),
+            )
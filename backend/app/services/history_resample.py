@@ -0,0 +1,227 @@
+import threading
+from collections import OrderedDict
+from typing import Dict, List, NamedTuple, Optional
+
+import numpy as np
+import pandas as pd
+
+from app.services.history_coverage import Range, coverage_manifest
+from app.services.history_service import BAR_LENGTHS
+from app.services.history_store import FLOAT_COLUMNS, HistoryStore, history_store, normalize_bars
+from app.services.market_calendar import Session, session_for
+
+# Finer intervals each coarse one can be built from, coarsest (cheapest) first
+RESAMPLE_SOURCES = {
+    "5m": ["1m"],
+    "15m": ["5m", "1m"],
+    "30m": ["15m", "5m", "1m"],
+    "1h": ["30m", "15m", "5m", "1m"],
+    "1d": ["1h", "30m", "15m", "5m", "1m"],
+    "1wk": ["1d"],
+    "1mo": ["1d"]
+}
+
+AGGREGATIONS = {
+    "Open": "first",
+    "High": "max",
+    "Low": "min",
+    "Close": "last",
+    "Adj Close": "last",
+    "Volume": "sum"
+}
+
+MAX_ENTRIES = 256
+
+
+def _session_offset(session: Session, length: pd.Timedelta) -> pd.Timedelta:
+    # Where the session open falls in a grid of ``length`` bins from local midnight
+    return pd.Timedelta(hours=session.open.hour, minutes=session.open.minute) % length
+
+
+def _local(index: pd.DatetimeIndex, session: Session) -> pd.DatetimeIndex:
+    return index.tz_localize("UTC").tz_convert(session.tz).tz_localize(None)
+
+
+def _utc(index: pd.DatetimeIndex, session: Session) -> pd.DatetimeIndex:
+    localized = index.tz_localize(session.tz, ambiguous=np.zeros(len(index), dtype=bool), nonexistent="shift_forward")
+    return localized.tz_convert("UTC").tz_localize(None)
+
+
+def _bin_labels(index: pd.DatetimeIndex, symbol: str, interval: str) -> pd.DatetimeIndex:
+    """
+    Label (start) of the bin each bar falls in. Intraday bins follow the
+    exchange clock from the session open, as Yahoo's bars do (NYSE hours
+    start at 09:30), and are labelled in tz-naive UTC; days are exchange
+    dates, like stored daily bars; weeks start on Monday, months on the 1st
+    (both built from daily bars, already exchange dates).
+    """
+    if interval == "1wk":
+        return index.normalize() - pd.to_timedelta(index.dayofweek, unit="D")
+    if interval == "1mo":
+        return index.to_period("M").to_timestamp()
+    session = session_for(symbol)
+    if interval == "1d":
+        return _local(index, session).normalize()
+    length = BAR_LENGTHS[interval]
+    offset = _session_offset(session, length)
+    local = _local(index, session)
+    return _utc((local - offset).floor(length) + offset, session)
+
+
+def bin_start(symbol: str, ts, interval: str) -> pd.Timestamp:
+    """Label of the ``interval`` bin of ``symbol`` containing ``ts`` (a date for days and up)."""
+    ts = pd.Timestamp(ts)
+    if interval in ("1d", "1wk", "1mo"):
+        ts = ts.normalize()
+        if interval == "1d":
+            return ts
+    return _bin_labels(pd.DatetimeIndex([ts]), symbol, interval)[0]
+
+
+def _source_time(symbol: str, label: pd.Timestamp, interval: str) -> pd.Timestamp:
+    # First instant of the bin, in the source's tz-naive UTC when that is intraday
+    if interval != "1d":
+        return label
+    return _utc(pd.DatetimeIndex([label]), session_for(symbol))[0]
+
+
+def _first_bin(symbol: str, start: pd.Timestamp, interval: str) -> pd.Timestamp:
+    """
+    First bin of a range starting at ``start``. Session-aligned bins begin
+    off the UTC clock (09:30 New York is 13:30 or 14:30 UTC, an ASX day at
+    13:00 or 14:00 UTC the day before), so one straddling ``start`` is
+    skipped rather than built from bars outside the range.
+    """
+    label = bin_start(symbol, start, interval)
+    if interval in ("1wk", "1mo") or _source_time(symbol, label, interval) >= start:
+        return label
+    if interval == "1d":
+        return label + pd.Timedelta(days=1)
+    return bin_start(symbol, label + BAR_LENGTHS[interval], interval)
+
+
+def resample_bars(bars: pd.DataFrame, symbol: str, interval: str) -> pd.DataFrame:
+    """OHLCV bars aggregated into ``interval`` bins; bins without bars are dropped."""
+    if bars.empty:
+        return normalize_bars(None)
+    aggregations = {col: AGGREGATIONS[col] for col in bars.columns if col in AGGREGATIONS}
+    resampled = bars.groupby(_bin_labels(bars.index, symbol, interval)).agg(aggregations)
+
+    prices = [col for col in resampled.columns if col in FLOAT_COLUMNS]
+    resampled = resampled.dropna(subset=prices, how="all")
+    if "Volume" in resampled.columns:
+        resampled["Volume"] = resampled["Volume"].astype(np.int64)
+    resampled.index.name = bars.index.name
+    return resampled
+
+
+def _covers(symbol: str, interval: str, start, end, tail: pd.Timedelta) -> bool:
+    # Covered except possibly for the last ``tail``, which a top-up fetch fills
+    return all(gap_start >= end - tail for gap_start, _ in coverage_manifest.missing(symbol, interval, start, end))
+
+
+def resample_source(symbol: str, interval: str, start, end) -> Optional[str]:
+    """
+    The finer interval to build ``interval`` from for [start, end), when
+    the series itself does not cover the range but a finer one does.
+    """
+    if interval not in RESAMPLE_SOURCES:
+        return None
+    tail = BAR_LENGTHS[interval]
+    start, end = pd.Timestamp(start), pd.Timestamp(end)
+    if _covers(symbol, interval, start, end, tail):
+        return None
+    first_bin = _source_time(symbol, _first_bin(symbol, start, interval), interval)
+    for source in RESAMPLE_SOURCES[interval]:
+        if _covers(symbol, source, first_bin, end, tail):
+            return source
+    return None
+
+
+class _Entry(NamedTuple):
+    start: pd.Timestamp
+    covered: List[Range]
+    bars: pd.DataFrame
+
+
+class ResampleCache:
+    """
+    Coarse bars derived from a finer stored series, memoized per
+    (symbol, source, interval). Later calls only re-aggregate from the last
+    (possibly partial) bin on, unless the finer series changed further back
+    (a back-fill shows up as a coverage change before its tail), in which
+    case the entry is rebuilt.
+    """
+
+    def __init__(self, store: HistoryStore, max_entries: int = MAX_ENTRIES):
+        self.store = store
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[tuple, _Entry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.rebuilds = 0
+
+    def _tail_only_growth(self, old: List[Range], new: List[Range]) -> bool:
+        if not old or len(new) != len(old):
+            return False
+        return new[:-1] == old[:-1] and new[-1][0] == old[-1][0] and new[-1][1] >= old[-1][1]
+
+    def _resample(self, symbol: str, source: str, interval: str, first_bin: pd.Timestamp) -> pd.DataFrame:
+        bars = self.store.read(symbol, source, _source_time(symbol, first_bin, interval), None)
+        return resample_bars(bars, symbol, interval)
+
+    def read(self, symbol: str, source: str, interval: str, start, end=None) -> pd.DataFrame:
+        key = (symbol, source, interval)
+        first_bin = _first_bin(symbol, pd.Timestamp(start), interval)
+        covered = coverage_manifest.covered(symbol, source)
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+
+        reusable = (
+            entry is not None
+            and not entry.bars.empty
+            and entry.start <= first_bin
+            and self._tail_only_growth(entry.covered, covered)
+        )
+        if reusable:
+            self.hits += 1
+            last_bin = entry.bars.index[-1]
+            fresh = self._resample(symbol, source, interval, last_bin)
+            bars = pd.concat([entry.bars[entry.bars.index < last_bin], fresh])
+            entry = _Entry(entry.start, covered, bars)
+        else:
+            self.rebuilds += 1
+            bars = self._resample(symbol, source, interval, first_bin)
+            entry = _Entry(first_bin, covered, bars)
+
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+        bars = entry.bars[entry.bars.index >= first_bin]
+        if end is not None:
+            bars = bars[bars.index <= pd.Timestamp(end)]
+        return bars
+
+    def read_latest(self, symbol: str, source: str, interval: str, start, end=None, limit: Optional[int] = None) -> pd.DataFrame:
+        """Same shape as ``HistoryStore.read_latest``: newest first, capped by limit."""
+        df = self.read(symbol, source, interval, start, end).sort_index(ascending=False)
+        return df if limit is None else df.head(limit)
+
+    def stats(self) -> Dict[str, int]:
+        return {"entries": len(self._entries), "hits": self.hits, "rebuilds": self.rebuilds}
+
+
+resample_cache = ResampleCache(history_store)
+
+
+def read_history(symbol: str, interval: str, start, end, limit: Optional[int], source: Optional[str] = None) -> pd.DataFrame:
+    """Newest-first bars of a series, resampled from ``source`` when given."""
+    if source is None:
+        return history_store.read_latest(symbol, interval, start, end, limit)
+    return resample_cache.read_latest(symbol, source, interval, start, end, limit)
@@ -0,0 +1,218 @@
+import logging
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from app.services.history_coverage import coverage_manifest
+from app.services.history_store import history_store, normalize_bars, split_by_ticker
+from app.services.market_data import market_data
+from app.services.upstream_client import is_rate_limited, upstream_client
+
+logger = logging.getLogger("history")
+
+# Max span yfinance serves per request for each interval
+INTERVAL_WINDOWS = {
+    "1m": timedelta(days=7),
+    "5m": timedelta(days=30),
+    "15m": timedelta(days=60),
+    "30m": timedelta(days=60),
+    "1h": timedelta(days=730),
+    "1d": timedelta(days=3650),
+    "1wk": timedelta(days=3650),
+    "1mo": timedelta(days=3650)
+}
+
+# Length of one bar: the newest bar keeps changing until this much time has passed
+BAR_LENGTHS = {
+    "1m": pd.Timedelta(minutes=1),
+    "5m": pd.Timedelta(minutes=5),
+    "15m": pd.Timedelta(minutes=15),
+    "30m": pd.Timedelta(minutes=30),
+    "1h": pd.Timedelta(hours=1),
+    "1d": pd.Timedelta(days=1),
+    "1wk": pd.Timedelta(weeks=1),
+    "1mo": pd.Timedelta(days=31)
+}
+
+# Tickers per planned download, and how many such downloads run at once
+DOWNLOAD_BATCH_SIZE = 50
+MAX_PARALLEL_DOWNLOADS = 4
+# Upstream requests (one per ticker) in flight at once across all downloads;
+# the shared token bucket still sets the rate
+MAX_PARALLEL_REQUESTS = 8
+
+_download_pool = ThreadPoolExecutor(max_workers=MAX_PARALLEL_DOWNLOADS, thread_name_prefix="yf-download")
+_request_pool = ThreadPoolExecutor(max_workers=MAX_PARALLEL_REQUESTS, thread_name_prefix="yf-request")
+
+
+def _has_weekday(start: datetime, end: datetime) -> bool:
+    # Any Monday-Friday date within [start, end)
+    last = pd.Timestamp(end) - pd.Timedelta(1)
+    return bool(len(pd.bdate_range(pd.Timestamp(start).normalize(), last)))
+
+
+def _download_window(symbols: List[str], interval: str, start: datetime, end: datetime):
+    """
+    One upstream request per symbol for [start, end), run on the request
+    pool. Each takes its own token and is retried on its own, so a 429
+    costs only the symbol it hit; after a symbol runs out of retries on a
+    429 the ones not started yet are not asked. Returns the bars and the
+    errors per symbol.
+    """
+    failed: Dict[str, Exception] = {}
+    throttled: List[Exception] = []
+
+    def fetch(symbol: str) -> Optional[pd.DataFrame]:
+        if throttled:
+            failed[symbol] = throttled[0]
+            return None
+        try:
+            return upstream_client.call(market_data.download, [symbol], start, end, interval)
+        except Exception as e:
+            logger.error(f"Failed download for {symbol} ({interval}): {e}")
+            failed[symbol] = e
+            if is_rate_limited(e):
+                throttled.append(e)
+            return None
+
+    bars: Dict[str, pd.DataFrame] = {}
+    for symbol, df in zip(symbols, _request_pool.map(fetch, symbols)):
+        if df is not None:
+            bars.update(split_by_ticker(df, [symbol]))
+    return bars, failed
+
+
+def _download_windows(symbols: List[str], interval: str, start: datetime, end: datetime):
+    """
+    Download every interval-sized window of [start, end). Returns the frames
+    per symbol, per symbol the windows whose answer can be trusted (empty or
+    not), and the last error of the symbols some window failed for.
+    """
+    window = INTERVAL_WINDOWS[interval]
+    frames: Dict[str, List[pd.DataFrame]] = defaultdict(list)
+    fetched: Dict[str, List[Tuple[datetime, datetime]]] = defaultdict(list)
+    errors: Dict[str, str] = {}
+    current_start = start
+
+    while current_start < end:
+        current_end = min(current_start + window, end)
+        logger.debug(f"Downloading {len(symbols)} symbols from {current_start} to {current_end} ({interval})")
+        by_symbol, failed = _download_window(symbols, interval, current_start, current_end)
+
+        # A ticker yfinance could not serve comes back empty, so an empty
+        # answer only counts as "no bars" when other tickers got some or
+        # when no trading day falls in the window
+        conclusive = bool(by_symbol) or not _has_weekday(current_start, current_end)
+        for symbol in symbols:
+            if symbol in failed:
+                errors[symbol] = str(failed[symbol])
+                continue
+            if symbol in by_symbol:
+                frames[symbol].append(by_symbol[symbol])
+            if symbol in by_symbol or conclusive:
+                fetched[symbol].append((current_start, current_end))
+            else:
+                errors[symbol] = f"No data returned for {current_start} to {current_end}"
+        if any(is_rate_limited(e) for e in failed.values()):
+            break  # Retries are spent; the rest is left for a later refresh
+        current_start = current_end
+
+    return frames, fetched, errors
+
+
+def download_bars_multi(symbols: List[str], interval: str, start: datetime, end: datetime) -> Dict[str, pd.DataFrame]:
+    """
+    Download [start, end) for several tickers in interval-sized windows.
+    Returns the normalized bars of every symbol that
+    got data.
+    """
+    frames, _, _ = _download_windows(symbols, interval, start, end)
+    return {symbol: normalize_bars(pd.concat(parts)) for symbol, parts in frames.items()}
+
+
+def download_bars(symbol: str, interval: str, start: datetime, end: datetime) -> pd.DataFrame:
+    """Download [start, end) for one ticker in interval-sized windows."""
+    return download_bars_multi([symbol], interval, start, end).get(symbol, normalize_bars(None))
+
+
+def refresh_history(symbol: str, interval: str, start: datetime, end: datetime) -> int:
+    """
+    Fetch whatever part of [start, end) the series does not cover yet and
+    append it. Returns the number of new rows.
+    """
+    return refresh_histories([symbol], interval, start, end).get(symbol, 0)
+
+
+def plan_fetches(
+    symbols: List[str],
+    interval: str,
+    start: datetime,
+    end: datetime,
+    starts: Optional[Dict[str, datetime]] = None
+) -> List[Tuple[datetime, datetime, List[str]]]:
+    """
+    Plan the downloads that complete [start, end) for every symbol (or from
+    ``starts[symbol]`` where given): each symbol's uncovered sub-ranges,
+    grouped with other symbols' gaps that start on the same day and end
+    together, in chunks of DOWNLOAD_BATCH_SIZE. Returns (start, end,
+    symbols) per download.
+    """
+    starts = starts or {}
+    groups: Dict[Tuple[pd.Timestamp, pd.Timestamp], List[Tuple[pd.Timestamp, str]]] = defaultdict(list)
+    for symbol in dict.fromkeys(symbols):
+        history_store.import_legacy_csv(symbol, interval)
+        for gap_start, gap_end in coverage_manifest.missing(symbol, interval, starts.get(symbol, start), end):
+            groups[(gap_start.floor("D"), gap_end)].append((gap_start, symbol))
+
+    plan = []
+    for (_, gap_end), members in groups.items():
+        for i in range(0, len(members), DOWNLOAD_BATCH_SIZE):
+            chunk = members[i:i + DOWNLOAD_BATCH_SIZE]
+            # From the earliest gap in the chunk; bars the others already have dedupe on append
+            plan.append((min(gap_start for gap_start, _ in chunk), gap_end, [symbol for _, symbol in chunk]))
+    return plan
+
+
+def refresh_histories(
+    symbols: List[str],
+    interval: str,
+    start: datetime,
+    end: datetime,
+    starts: Optional[Dict[str, datetime]] = None
+) -> Dict[str, int]:
+    """
+    Bring several series to cover [start, end), or [starts[symbol], end),
+    downloading only the ranges the coverage manifest lacks (back-fills and
+    holes included). Downloads run on a pool of MAX_PARALLEL_DOWNLOADS.
+    Returns the number of new rows per symbol.
+    """
+    # The newest bar may still change, so it is never recorded as covered
+    settled = pd.Timestamp(datetime.utcnow()) - BAR_LENGTHS[interval]
+
+    def run(fetch_start, fetch_end, chunk: List[str]) -> Dict[str, int]:
+        frames, fetched, errors = _download_windows(chunk, interval, fetch_start, fetch_end)
+        new_rows = {}
+        for symbol in chunk:
+            parts = frames.get(symbol)
+            if not parts and not history_store.series_dir(symbol, interval).exists():
+                new_rows[symbol] = 0
+                continue  # Nothing stored and nothing found: don't start a series
+            # Pin down what the store covered before these bars are added
+            coverage_manifest.ensure(symbol, interval)
+            new_rows[symbol] = history_store.append(symbol, interval, pd.concat(parts)) if parts else 0
+            coverage_manifest.add(symbol, interval, [
+                (pd.Timestamp(s), min(pd.Timestamp(e), settled)) for s, e in fetched.get(symbol, ())
+            ])
+            history_store.record_fetch(symbol, interval, errors.get(symbol))
+        return new_rows
+
+    futures = [_download_pool.submit(run, *fetch) for fetch in plan_fetches(symbols, interval, start, end, starts)]
+
+    new_rows = {symbol: 0 for symbol in symbols}
+    for future in futures:
+        for symbol, rows in future.result().items():
+            new_rows[symbol] += rows
+    return new_rows
@@ -0,0 +1,455 @@
+import logging
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+
+from app.services.history_index import INDEX_FILE, SeriesIndex, SeriesMeta
+
+try:
+    import fcntl
+except ImportError:  # Windows: compaction is then only serialized within a process
+    fcntl = None
+
+logger = logging.getLogger("history")
+
+DATA_DIR = Path(__file__).parent.parent / "data"
+
+# Provider this process fetches from (see market_data.provider_from_env)
+MARKET_DATA_PROVIDER = os.getenv("MARKET_DATA_PROVIDER", "yfinance").lower()
+# Root of everything fetched (history, fundamentals cache). Replay runs get
+# their own, so synthetic data never lands in the live store
+STORE_DIR = Path(os.getenv(
+    "MARKET_DATA_STORE",
+    str(DATA_DIR / "replay" if MARKET_DATA_PROVIDER == "replay" else DATA_DIR)
+))
+HISTORY_DIR = STORE_DIR / "history"
+LEGACY_CSV_DIR = STORE_DIR / "yfinance_cache"
+
+TIMESTAMP = "timestamp"
+FLOAT_COLUMNS = ["Open", "High", "Low", "Close", "Adj Close"]
+INT_COLUMNS = ["Volume"]
+BAR_COLUMNS = FLOAT_COLUMNS + INT_COLUMNS
+
+# Small row groups let timestamp bounds skip most of a dense 1m partition
+ROW_GROUP_SIZE = 8192
+
+SEGMENTS_DIR = "segments"
+# A series is compacted once it has this many segments or its oldest one is this old
+COMPACT_MIN_SEGMENTS = 8
+COMPACT_MAX_AGE = 300
+COMPACT_EVERY = 30
+
+
+def _pick_price_level(columns: pd.MultiIndex) -> int:
+    # yfinance labels columns (Price, Ticker) or (Ticker, Price) depending on group_by
+    for level in range(columns.nlevels):
+        if set(columns.get_level_values(level)) & set(BAR_COLUMNS):
+            return level
+    return 0
+
+
+def normalize_bars(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Bring a yfinance frame (or a legacy CSV) to the stored shape: a sorted,
+    unique, tz-naive UTC DatetimeIndex named "timestamp", float64 prices and
+    int64 volume.
+    """
+    if df is None or df.empty:
+        return pd.DataFrame(columns=BAR_COLUMNS, index=pd.DatetimeIndex([], name=TIMESTAMP))
+
+    df = df.copy()
+    if isinstance(df.columns, pd.MultiIndex):
+        df.columns = df.columns.get_level_values(_pick_price_level(df.columns))
+
+    index = pd.to_datetime(df.index, errors="coerce", utc=True)
+    df.index = index.tz_localize(None)
+    df = df[~df.index.isna()]
+    df = df[[col for col in BAR_COLUMNS if col in df.columns]]
+
+    for col in df.columns:
+        values = pd.to_numeric(df[col], errors="coerce")
+        if col in INT_COLUMNS:
+            df[col] = values.fillna(0).astype(np.int64)
+        else:
+            df[col] = values.astype(np.float64)
+
+    df = df[~df.index.duplicated(keep="last")].sort_index()
+    df.index.name = TIMESTAMP
+    return df
+
+
+def split_by_ticker(df: pd.DataFrame, symbols: List[str]) -> Dict[str, pd.DataFrame]:
+    """Per-symbol normalized frames out of a multi-ticker yfinance download."""
+    if df is None or df.empty:
+        return {}
+    if not isinstance(df.columns, pd.MultiIndex):
+        return {symbols[0]: normalize_bars(df)} if len(symbols) == 1 else {}
+
+    ticker_level = 1 - _pick_price_level(df.columns)
+    tickers = set(df.columns.get_level_values(ticker_level))
+    result = {}
+    for symbol in symbols:
+        if symbol not in tickers:
+            continue
+        # The frame is aligned on the union of all tickers' timestamps
+        frame = df.xs(symbol, axis=1, level=ticker_level).dropna(how="all")
+        if not frame.empty:
+            result[symbol] = normalize_bars(frame)
+    return result
+
+
+def _timestamp_bounds(path: Path) -> Optional[Tuple[pd.Timestamp, pd.Timestamp]]:
+    parquet_file = pq.ParquetFile(path)
+    column = parquet_file.schema_arrow.get_field_index(TIMESTAMP)
+    lows, highs = [], []
+    for i in range(parquet_file.metadata.num_row_groups):
+        stats = parquet_file.metadata.row_group(i).column(column).statistics
+        if stats is None or not stats.has_min_max:
+            # No statistics written: fall back to reading the column
+            values = pq.read_table(path, columns=[TIMESTAMP]).column(0).to_pylist()
+            return (pd.Timestamp(min(values)), pd.Timestamp(max(values))) if values else None
+        lows.append(stats.min)
+        highs.append(stats.max)
+    return (pd.Timestamp(min(lows)), pd.Timestamp(max(highs))) if lows else None
+
+
+@contextmanager
+def file_lock(path: Path, blocking: bool = True):
+    """
+    Exclusive advisory lock on ``path``, held across processes. Yields False
+    instead of waiting when ``blocking`` is off and the lock is taken.
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "a") as lock_file:
+        if fcntl is None:
+            yield True
+            return
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _write_atomic(df: pd.DataFrame, path: Path):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f".{path.name}.{uuid.uuid4().hex}.tmp")
+    df.to_parquet(tmp_path, index=True, row_group_size=ROW_GROUP_SIZE)
+    os.replace(tmp_path, path)
+
+
+def _dedupe(frames: List[pd.DataFrame]) -> pd.DataFrame:
+    # Later frames win: base partitions first, then segments oldest to newest
+    frames = [frame for frame in frames if not frame.empty]
+    if not frames:
+        return normalize_bars(None)
+    df = pd.concat(frames)
+    return df[~df.index.duplicated(keep="last")].sort_index()
+
+
+class HistoryStore:
+    """
+    Bars per symbol+interval kept as Parquet files partitioned by month,
+    plus a log of small immutable delta segments:
+
+        {root}/{symbol}_{interval}/{YYYY}/{MM}.parquet
+        {root}/{symbol}_{interval}/segments/{time_ns}-{id}.parquet
+
+    Appends only write a new segment (aside, then renamed), so their cost
+    follows the new bars and concurrent writers never touch the same file.
+    Reads merge the base partitions overlapping the range with the segments,
+    newer segments winning. ``compact`` folds the segments into the base
+    partitions under a per-series file lock. The extent of every series is
+    kept in a SeriesIndex at ``{root}/index.sqlite``.
+    """
+
+    def __init__(self, root: Path = HISTORY_DIR):
+        self.root = root
+        self.index = SeriesIndex(root / INDEX_FILE)
+
+    def series_dir(self, symbol: str, interval: str) -> Path:
+        return self.root / f"{symbol}_{interval}"
+
+    def list_series(self) -> List[Tuple[str, str]]:
+        if not self.root.exists():
+            return []
+        series = []
+        for path in sorted(self.root.iterdir()):
+            if path.is_dir() and "_" in path.name:
+                symbol, interval = path.name.rsplit("_", 1)
+                series.append((symbol, interval))
+        return series
+
+    def partitions(self, symbol: str, interval: str) -> List[Tuple[pd.Timestamp, Path]]:
+        """(month start, path) of every partition, oldest first."""
+        series_dir = self.series_dir(symbol, interval)
+        if not series_dir.exists():
+            return []
+        result = []
+        for path in series_dir.glob("[0-9][0-9][0-9][0-9]/[0-9][0-9].parquet"):
+            result.append((pd.Timestamp(year=int(path.parent.name), month=int(path.stem), day=1), path))
+        result.sort()
+        return result
+
+    def _pruned(self, symbol: str, interval: str, start, end) -> List[Path]:
+        paths = []
+        for month_start, path in self.partitions(symbol, interval):
+            month_end = month_start + pd.offsets.MonthBegin(1)
+            if start is not None and month_end <= start:
+                continue
+            if end is not None and month_start > end:
+                continue
+            paths.append(path)
+        return paths
+
+    def _read_partition(self, path: Path, start=None, end=None, columns=None) -> pd.DataFrame:
+        filters = []
+        if start is not None:
+            filters.append((TIMESTAMP, ">=", pd.Timestamp(start)))
+        if end is not None:
+            filters.append((TIMESTAMP, "<=", pd.Timestamp(end)))
+        return pd.read_parquet(path, columns=columns, filters=filters or None)
+
+    def segments(self, symbol: str, interval: str) -> List[Path]:
+        """Segment files, oldest first."""
+        segments_dir = self.series_dir(symbol, interval) / SEGMENTS_DIR
+        if not segments_dir.exists():
+            return []
+        return sorted(segments_dir.glob("*.parquet"))
+
+    def _read_segments(self, symbol: str, interval: str, start, end) -> Tuple[pd.DataFrame, List[Path]]:
+        paths = self.segments(symbol, interval)
+        return _dedupe([self._read_partition(path, start, end) for path in paths]), paths
+
+    def _retry_compacted(self, symbol: str, interval: str, read):
+        # Segments are read before the base. If a compaction removed any of them
+        # meanwhile, the base already holds their bars (and possibly newer
+        # revisions of them), so the merge is redone from scratch
+        for _ in range(3):
+            try:
+                df, segment_paths = read()
+                if all(path.exists() for path in segment_paths):
+                    return df
+            except FileNotFoundError:
+                pass
+        # Still racing compactions: read with them held off
+        with self._compaction_lock(symbol, interval, blocking=True):
+            return read()[0]
+
+    def read(self, symbol: str, interval: str, start=None, end=None) -> pd.DataFrame:
+        start = pd.Timestamp(start) if start is not None else None
+        end = pd.Timestamp(end) if end is not None else None
+
+        def read():
+            segments, segment_paths = self._read_segments(symbol, interval, start, end)
+            base = [self._read_partition(path, start, end) for path in self._pruned(symbol, interval, start, end)]
+            return _dedupe(base + [segments]), segment_paths
+
+        return self._retry_compacted(symbol, interval, read)
+
+    def read_latest(self, symbol: str, interval: str, start=None, end=None, limit: Optional[int] = None) -> pd.DataFrame:
+        """
+        The newest ``limit`` bars within [start, end], newest first. Partitions
+        are visited newest first and the walk stops once ``limit`` rows are in
+        hand, so the work follows the size of the answer, not of the series.
+        """
+        start = pd.Timestamp(start) if start is not None else None
+        end = pd.Timestamp(end) if end is not None else None
+
+        def read():
+            segments, segment_paths = self._read_segments(symbol, interval, start, end)
+            frames = []
+            seen = segments.index
+            for path in reversed(self._pruned(symbol, interval, start, end)):
+                frame = self._read_partition(path, start, end)
+                if frame.empty:
+                    continue
+                frames.append(frame)
+                seen = seen.union(frame.index)
+                # Bars not read yet are older than this partition's first one
+                if limit is not None and (seen >= frame.index.min()).sum() >= limit:
+                    break
+            return _dedupe(frames[::-1] + [segments]), segment_paths
+
+        df = self._retry_compacted(symbol, interval, read).sort_index(ascending=False)
+        return df if limit is None else df.head(limit)
+
+    def _bound(self, symbol: str, interval: str, newest: bool) -> Optional[pd.Timestamp]:
+        # Footer statistics of one partition (newest or oldest) plus every segment
+        candidates = []
+        for path in self.segments(symbol, interval):
+            try:
+                bounds = _timestamp_bounds(path)
+            except FileNotFoundError:
+                continue  # Compacted meanwhile, so covered by the partitions below
+            if bounds is not None:
+                candidates.append(bounds[newest])
+        partitions = self.partitions(symbol, interval)
+        for _, path in (reversed(partitions) if newest else partitions):
+            bounds = _timestamp_bounds(path)
+            if bounds is not None:
+                candidates.append(bounds[newest])
+                break
+        if not candidates:
+            return None
+        return max(candidates) if newest else min(candidates)
+
+    def scan_stats(self, symbol: str, interval: str) -> Dict:
+        """Extent of a series from its file footers; rows count segment overlaps twice."""
+        rows = size = 0
+        for path in [path for _, path in self.partitions(symbol, interval)] + self.segments(symbol, interval):
+            try:
+                rows += pq.ParquetFile(path).metadata.num_rows
+                size += path.stat().st_size
+            except FileNotFoundError:
+                continue  # Compacted meanwhile
+        return {
+            "first_ts": self._bound(symbol, interval, newest=False),
+            "last_ts": self._bound(symbol, interval, newest=True),
+            "rows": rows,
+            "bytes": size,
+        }
+
+    def meta(self, symbol: str, interval: str) -> Optional[SeriesMeta]:
+        """Indexed metadata of a stored series, None if there is no such series."""
+        if not self.series_dir(symbol, interval).exists():
+            return None
+        return self.index.get_or_scan(symbol, interval, lambda: self.scan_stats(symbol, interval))
+
+    def first_timestamp(self, symbol: str, interval: str) -> Optional[pd.Timestamp]:
+        meta = self.meta(symbol, interval)
+        return meta.first_ts if meta is not None else None
+
+    def last_timestamp(self, symbol: str, interval: str) -> Optional[pd.Timestamp]:
+        meta = self.meta(symbol, interval)
+        return meta.last_ts if meta is not None else None
+
+    def record_fetch(self, symbol: str, interval: str, error: Optional[str] = None):
+        if self.meta(symbol, interval) is not None:
+            self.index.record_fetch(symbol, interval, error)
+
+    def append(self, symbol: str, interval: str, bars: pd.DataFrame) -> int:
+        bars = normalize_bars(bars)
+        if bars.empty:
+            return 0
+
+        # Index what is stored before the new segment shows up in a scan
+        self.meta(symbol, interval)
+        segments_dir = self.series_dir(symbol, interval) / SEGMENTS_DIR
+        path = segments_dir / f"{time.time_ns():020d}-{uuid.uuid4().hex[:8]}.parquet"
+        _write_atomic(bars, path)
+        self.index.record_append(symbol, interval, bars.index[0], bars.index[-1], len(bars), path.stat().st_size)
+        return len(bars)
+
+    def _compaction_lock(self, symbol: str, interval: str, blocking: bool = False):
+        # Shared by API workers and the scheduler
+        return file_lock(self.series_dir(symbol, interval) / ".compact.lock", blocking)
+
+    def needs_compaction(self, symbol: str, interval: str) -> bool:
+        segments = self.segments(symbol, interval)
+        if not segments:
+            return False
+        if len(segments) >= COMPACT_MIN_SEGMENTS:
+            return True
+        oldest_ns = int(segments[0].name.split("-", 1)[0])
+        return time.time_ns() - oldest_ns >= COMPACT_MAX_AGE * 1_000_000_000
+
+    def compact(self, symbol: str, interval: str) -> int:
+        """
+        Merge the current segments into the base partitions, then drop them.
+        Segments written meanwhile are left for the next run. Returns the
+        number of segments folded in (0 if another process holds the lock).
+        """
+        with self._compaction_lock(symbol, interval) as locked:
+            if not locked:
+                return 0
+            segments = self.segments(symbol, interval)
+            if not segments:
+                return 0
+
+            bars = _dedupe([pd.read_parquet(path) for path in segments])
+            series_dir = self.series_dir(symbol, interval)
+            for (year, month), chunk in bars.groupby([bars.index.year, bars.index.month]):
+                path = series_dir / f"{year:04d}" / f"{month:02d}.parquet"
+                if path.exists():
+                    chunk = _dedupe([pd.read_parquet(path), chunk])
+                _write_atomic(chunk, path)
+
+            # Only after every partition is in place, so readers never miss bars
+            for path in segments:
+                path.unlink()
+            self.index.record_stats(symbol, interval, self.scan_stats(symbol, interval))
+            return len(segments)
+
+    def compact_all(self, force: bool = False) -> int:
+        compacted = 0
+        for symbol, interval in self.list_series():
+            if force or self.needs_compaction(symbol, interval):
+                try:
+                    compacted += self.compact(symbol, interval)
+                except Exception as e:
+                    logger.error(f"Compaction failed for {symbol} ({interval}): {e}")
+        return compacted
+
+    def import_legacy_csv(self, symbol: str, interval: str) -> int:
+        """Move a ``{symbol}_{interval}.csv`` from the old cache into the store."""
+        csv_path = LEGACY_CSV_DIR / f"{symbol}_{interval}.csv"
+        if not csv_path.exists():
+            return 0
+        rows = self.append(symbol, interval, pd.read_csv(csv_path, index_col=0))
+        csv_path.rename(csv_path.with_suffix(".csv.imported"))
+        return rows
+
+    def import_all_legacy_csv(self) -> int:
+        if not LEGACY_CSV_DIR.exists():
+            return 0
+        rows = 0
+        for csv_path in LEGACY_CSV_DIR.glob("*_*.csv"):
+            symbol, interval = csv_path.stem.rsplit("_", 1)
+            rows += self.import_legacy_csv(symbol, interval)
+        return rows
+
+
+class HistoryCompactor:
+    """Background thread that periodically compacts the segment log."""
+
+    def __init__(self, store: HistoryStore, every: float = COMPACT_EVERY):
+        self.store = store
+        self.every = every
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="history-compactor", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.every):
+            compacted = self.store.compact_all()
+            if compacted:
+                logger.info(f"Compacted {compacted} history segments")
+
+
+history_store = HistoryStore()
+history_compactor = HistoryCompactor(history_store)
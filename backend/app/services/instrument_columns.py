@@ -0,0 +1,247 @@
+import operator
+import threading
+from bisect import bisect_left, bisect_right
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.models.query_filters import ORDERED_FIELD_VALUES, FilterCondition
+from app.services.binary_catalog import BinaryCatalog
+from app.services.local_symbol_service import CatalogSnapshot, get_catalog
+
+_ORDERED_COMPARE = {
+    "gt": operator.gt,
+    "gte": operator.ge,
+    "lt": operator.lt,
+    "lte": operator.le,
+}
+
+
+class Column:
+    """
+    Dictionary-encoded column: one int32 code per row pointing into
+    ``categories``. Code -1 stands for a missing value.
+    """
+
+    def __init__(self, codes: np.ndarray, categories: List):
+        self.codes = codes
+        self.categories = categories
+        self._lowered: Optional[List[str]] = None
+        self._by_value: Optional[Dict[str, List[int]]] = None
+        self._sorted: Optional[Tuple[List[str], List[int]]] = None
+        self._postings: Optional[Tuple[np.ndarray, np.ndarray]] = None
+
+    @classmethod
+    def encode(cls, values) -> "Column":
+        lookup: Dict[object, int] = {}
+        categories = []
+        codes = np.empty(len(values), dtype=np.int32)
+        for i, value in enumerate(values):
+            if value is None:
+                codes[i] = -1
+                continue
+            code = lookup.get(value)
+            if code is None:
+                code = lookup[value] = len(categories)
+                categories.append(value)
+            codes[i] = code
+        return cls(codes, categories)
+
+    @property
+    def lowered(self) -> List[str]:
+        if self._lowered is None:
+            self._lowered = [str(value).lower() for value in self.categories]
+        return self._lowered
+
+    def contains_lut(self, needle: str) -> np.ndarray:
+        # Match once per distinct value; the result is indexed by code.
+        # The trailing slot is what code -1 indexes: str(None) == "none".
+        needle = needle.lower()
+        lut = np.fromiter(
+            (needle in value for value in self.lowered),
+            dtype=bool,
+            count=len(self.categories),
+        )
+        return np.append(lut, needle in "none")
+
+    def contains(self, needle: str) -> np.ndarray:
+        return self.contains_lut(needle)[self.codes]
+
+    def codes_equal(self, values) -> List[int]:
+        # Hash index: lowercased value -> codes (several raw values may fold together)
+        if self._by_value is None:
+            by_value: Dict[str, List[int]] = {}
+            for code, value in enumerate(self.lowered):
+                by_value.setdefault(value, []).append(code)
+            self._by_value = by_value
+        # Values that fold together (USD, usd) must not yield a code twice
+        return list(dict.fromkeys(code for value in values for code in self._by_value.get(value.lower(), ())))
+
+    def codes_with_prefix(self, prefix: str) -> List[int]:
+        # Sorted dictionary: the values starting with ``prefix`` are one run of it
+        if self._sorted is None:
+            order = sorted(range(len(self.categories)), key=self.lowered.__getitem__)
+            self._sorted = ([self.lowered[code] for code in order], order)
+        values, order = self._sorted
+        prefix = prefix.lower()
+        return order[bisect_left(values, prefix):bisect_right(values, prefix + "\uffff")]
+
+    def positions(self, codes: List[int]) -> np.ndarray:
+        """Sorted row positions holding any of ``codes``, read from the postings."""
+        if self._postings is None:
+            order = np.argsort(self.codes, kind="stable")
+            bounds = np.searchsorted(self.codes[order], np.arange(len(self.categories) + 1))
+            self._postings = (order, bounds)
+        order, bounds = self._postings
+
+        parts = [order[bounds[code]:bounds[code + 1]] for code in codes]
+        if not parts:
+            return np.empty(0, dtype=np.int64)
+        if len(parts) == 1:
+            return parts[0]
+        return np.sort(np.concatenate(parts))
+
+
+class ColumnStore:
+    """
+    Column-oriented view of a catalog snapshot. Columns are encoded on first
+    use and only the requested rows are turned back into dicts.
+
+    eq/in and prefix conditions are answered from the per-column hash index
+    and sorted dictionary, ordered ones from the few values they rank, then
+    the postings, in time proportional to the matches. Only
+    contains conditions scan, and only the rows the indexed conditions
+    left over when there are any.
+    """
+
+    def __init__(self, data: dict):
+        self._data = data
+        self.symbols: List[str] = list(data.keys())
+        self._columns: Dict[str, Column] = {}
+        self._positions: Optional[Dict[str, int]] = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_snapshot(cls, snapshot: CatalogSnapshot) -> "ColumnStore":
+        if snapshot.binary is not None:
+            return MappedColumnStore(snapshot.binary)
+        return cls(snapshot.data)
+
+    def __len__(self):
+        return len(self.symbols)
+
+    def column(self, field: str) -> Column:
+        column = self._columns.get(field)
+        if column is not None:
+            return column
+        with self._lock:
+            column = self._columns.get(field)
+            if column is None:
+                if field == "symbol":
+                    values = self.symbols
+                else:
+                    values = [(item or {}).get(field) for item in self._data.values()]
+                column = self._columns[field] = Column.encode(values)
+        return column
+
+    def position_of(self, symbol: str) -> Optional[int]:
+        if self._positions is None:
+            self._positions = {sym: pos for pos, sym in enumerate(self.symbols)}
+        return self._positions.get(symbol)
+
+    def _matching_codes(self, column: Column, condition: FilterCondition) -> List[int]:
+        op, values = condition.op, condition.values
+        if op in ("eq", "in"):
+            return column.codes_equal(values)
+        if op == "prefix":
+            return column.codes_with_prefix(values[0])
+
+        # Ordered comparison, e.g. market_cap >= Mid Cap
+        rank = {value.lower(): i for i, value in enumerate(ORDERED_FIELD_VALUES[condition.field])}
+        target = rank[values[0].lower()]
+        compare = _ORDERED_COMPARE[op]
+        return [
+            code for code, value in enumerate(column.lowered)
+            if value in rank and compare(rank[value], target)
+        ]
+
+    def condition_mask(self, condition: FilterCondition) -> np.ndarray:
+        column = self.column(condition.field)
+        if condition.op == "contains":
+            return column.contains(condition.values[0])
+        mask = np.zeros(len(self), dtype=bool)
+        mask[column.positions(self._matching_codes(column, condition))] = True
+        return mask
+
+    def filter_masks(self, conditions: List[FilterCondition]) -> Dict[str, np.ndarray]:
+        return {condition.field: self.condition_mask(condition) for condition in conditions}
+
+    def match(self, conditions: List[FilterCondition]) -> np.ndarray:
+        """Sorted positions of the rows matching every condition."""
+        indexed = []
+        scans = []
+        for condition in conditions:
+            if condition.op == "contains":
+                scans.append(condition)
+            else:
+                column = self.column(condition.field)
+                indexed.append(column.positions(self._matching_codes(column, condition)))
+
+        if indexed:
+            indexed.sort(key=len)
+            positions = indexed[0]
+            for other in indexed[1:]:
+                positions = np.intersect1d(positions, other, assume_unique=True)
+            # Check leftovers against the distinct values, not the whole column
+            for condition in scans:
+                column = self.column(condition.field)
+                lut = column.contains_lut(condition.values[0])
+                positions = positions[lut[column.codes[positions]]]
+            return positions
+
+        mask = np.ones(len(self), dtype=bool)
+        for condition in scans:
+            mask &= self.column(condition.field).contains(condition.values[0])
+            if not mask.any():
+                break
+        return np.flatnonzero(mask)
+
+    def rows(self, positions) -> List[dict]:
+        results = []
+        for pos in positions:
+            sym = self.symbols[pos]
+            results.append({"symbol": sym, **(self._data[sym] or {})})
+        return results
+
+
+class MappedColumnStore(ColumnStore):
+    """
+    ColumnStore over a memory-mapped binary catalog: the file already holds
+    every column dictionary-encoded, so columns are just views on it.
+    """
+
+    def __init__(self, catalog: BinaryCatalog):
+        self._catalog = catalog
+        self.symbols = catalog.symbols
+        self._columns = {
+            field: Column(codes, strings) for field, (codes, strings) in catalog.columns.items()
+        }
+        self._positions = None
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return self._catalog.rows
+
+    def column(self, field: str) -> Column:
+        column = self._columns.get(field)
+        if column is None:
+            # Field absent from this catalog: every row is missing
+            column = Column(np.full(len(self), -1, dtype=np.int32), [])
+        return column
+
+    def rows(self, positions) -> List[dict]:
+        return [{"symbol": self.symbols[pos], **self._catalog.row(pos)} for pos in positions]
+
+
+def get_column_store(instrument_type: str) -> ColumnStore:
+    return get_catalog(instrument_type).derived("column_store", ColumnStore.from_snapshot)
@@ -1,5 +1,11 @@
+import itertools
 import json
+import threading
+import time
 from pathlib import Path
+from typing import Callable, Dict, Mapping, Optional, Tuple
+
+from app.services.binary_catalog import BinaryCatalog, MappedCatalog
 
 DATA_DIR = Path(__file__).parent.parent / "data"
 
@@ -13,39 +19,161 @@ VALID_TYPES = {
     "moneymarkets": "Moneymarkets",
 }
 
-def load_symbols(instrument_type: str) -> dict:
-    from pathlib import Path
-    import json
+_versions = itertools.count(1)
 
-    VALID_TYPES = {
-        "equities": "Equities",
-        "currencies": "Currencies",
-        "cryptos": "Cryptos",
-        "etfs": "ETFs",
-        "funds": "Funds",
-        "indices": "Indices",
-        "moneymarkets": "Moneymarkets",
-    }
 
-    type_key = instrument_type.lower()
-    if type_key not in VALID_TYPES:
-        raise FileNotFoundError(f"Invalid type '{instrument_type}'")
+class CatalogSnapshot:
+    """
+    One loaded copy of an instrument catalog: either the parsed
+    ``all_<Type>.json`` or, when present, the memory-mapped ``all_<Type>.bin``
+    (``binary`` is set and ``data`` is a read-only view over it).
+
+    Snapshots are shared by every request of the process and must be treated
+    as read-only. Structures derived from the data (search indexes, columns...)
+    are memoized on the snapshot, so they are dropped together with it when
+    the file changes on disk.
+    """
+
+    def __init__(
+        self,
+        type_key: str,
+        data: Mapping,
+        signature: Tuple,
+        binary: Optional[BinaryCatalog] = None,
+    ):
+        self.type_key = type_key
+        self.data = data
+        self.signature = signature
+        self.binary = binary
+        self.version = next(_versions)
+        self.loaded_at = time.time()
+        self._derived: Dict[str, object] = {}
+        self._derived_lock = threading.RLock()
+
+    def derived(self, name: str, builder: Callable[["CatalogSnapshot"], object]):
+        value = self._derived.get(name)
+        if value is not None:
+            return value
+        with self._derived_lock:
+            value = self._derived.get(name)
+            if value is None:
+                value = builder(self)
+                self._derived[name] = value
+        return value
+
+
+class CatalogManager:
+    """
+    Keeps one snapshot per instrument type in memory and reloads it only when
+    the file's mtime or size changes. The binary catalog is preferred over the
+    JSON export unless the JSON is newer. A reload builds the new snapshot aside
+    and swaps it in, so concurrent readers never see a half-loaded catalog.
+    """
+
+    def __init__(self):
+        self._snapshots: Dict[str, CatalogSnapshot] = {}
+        self._locks = {type_key: threading.Lock() for type_key in VALID_TYPES}
+        self._counters = {type_key: {"hits": 0, "reloads": 0} for type_key in VALID_TYPES}
+
+    def get(self, instrument_type: str) -> CatalogSnapshot:
+        type_key = resolve_type_key(instrument_type)
+        path, st = _pick_catalog_file(type_key)
+        signature = (path.suffix, st.st_mtime_ns, st.st_size)
+
+        snapshot = self._snapshots.get(type_key)
+        if snapshot is not None and snapshot.signature == signature:
+            self._counters[type_key]["hits"] += 1
+            return snapshot
+
+        with self._locks[type_key]:
+            # Another request may have reloaded while we waited for the lock
+            snapshot = self._snapshots.get(type_key)
+            if snapshot is not None and snapshot.signature == signature:
+                self._counters[type_key]["hits"] += 1
+                return snapshot
+
+            if path.suffix == ".bin":
+                binary = BinaryCatalog(path)
+                snapshot = CatalogSnapshot(type_key, MappedCatalog(binary), signature, binary)
+            else:
+                snapshot = CatalogSnapshot(type_key, _read_catalog(path), signature)
+            self._snapshots[type_key] = snapshot
+            self._counters[type_key]["reloads"] += 1
+            return snapshot
+
+    def clear(self):
+        self._snapshots.clear()
+
+    def stats(self) -> dict:
+        result = {}
+        for type_key, counters in self._counters.items():
+            snapshot = self._snapshots.get(type_key)
+            result[type_key] = {
+                **counters,
+                "loaded": snapshot is not None,
+                "version": snapshot.version if snapshot else None,
+                "format": ("binary" if snapshot.binary else "json") if snapshot else None,
+                "records": len(snapshot.data) if snapshot else 0,
+                "loaded_at": snapshot.loaded_at if snapshot else None,
+            }
+        return result
+
+
+def _pick_catalog_file(type_key: str):
+    json_path = catalog_path(type_key)
+    bin_path = binary_catalog_path(type_key)
+    json_st = json_path.stat() if json_path.exists() else None
+    bin_st = bin_path.stat() if bin_path.exists() else None
 
-    filename = f"all_{VALID_TYPES[type_key]}.json"
-    path = Path(__file__).parent.parent / "data" / filename
+    if bin_st and (json_st is None or bin_st.st_mtime_ns >= json_st.st_mtime_ns):
+        return bin_path, bin_st
+    if json_st:
+        return json_path, json_st
+    raise FileNotFoundError(f"File not found: {json_path.name}")
 
-    if not path.exists():
-        raise FileNotFoundError(f"File not found: {filename}")
 
+def _read_catalog(path: Path) -> dict:
     with open(path, "r") as f:
         raw_data = json.load(f)
 
     # inject 'symbol' key into each item
     for sym, item in raw_data.items():
-        item["symbol"] = sym
+        if item is not None:
+            item["symbol"] = sym
 
     return raw_data
 
-    
+
+def resolve_type_key(instrument_type: str) -> str:
+    type_key = instrument_type.lower()
+    if type_key not in VALID_TYPES:
+        raise FileNotFoundError(f"Invalid type '{instrument_type}'")
+    return type_key
+
+
+def catalog_path(type_key: str) -> Path:
+    return DATA_DIR / f"all_{VALID_TYPES[type_key]}.json"
+
+
+def binary_catalog_path(type_key: str) -> Path:
+    return DATA_DIR / f"all_{VALID_TYPES[type_key]}.bin"
+
+
+catalog_manager = CatalogManager()
+
+
+def get_catalog(instrument_type: str) -> CatalogSnapshot:
+    return catalog_manager.get(instrument_type)
+
+
+def load_symbols(instrument_type: str) -> Mapping:
+    # Shared, cached copy: callers must not mutate it
+    return catalog_manager.get(instrument_type).data
+
+
+def get_catalog_stats() -> dict:
+    return catalog_manager.stats()
+
+
 def get_available_instrument_types() -> list[str]:
-    return list(VALID_TYPES.keys())
\ No newline at end of file
+    return list(VALID_TYPES.keys())
@@ -0,0 +1,170 @@
+from datetime import datetime, time, timedelta
+from functools import lru_cache
+from typing import NamedTuple, Optional, Tuple
+from zoneinfo import ZoneInfo
+
+import pandas as pd
+
+from app.services.local_symbol_service import VALID_TYPES, load_symbols
+
+UTC = ZoneInfo("UTC")
+
+
+class Session(NamedTuple):
+    """Regular trading hours in the exchange's local time. Holidays are not modelled."""
+    tz: str
+    open: time
+    close: time
+    weekdays: Tuple[int, ...] = (0, 1, 2, 3, 4)
+
+
+ALWAYS_OPEN = Session("UTC", time(0, 0), time(0, 0), (0, 1, 2, 3, 4, 5, 6))
+# Spot FX: Sunday 22:00 to Friday 22:00 UTC, approximated as Monday-Friday UTC days
+FX = Session("UTC", time(0, 0), time(0, 0))
+
+
+def _session(tz: str, open_at: str, close_at: str, weekdays: Tuple[int, ...] = (0, 1, 2, 3, 4)) -> Session:
+    return Session(tz, time.fromisoformat(open_at), time.fromisoformat(close_at), weekdays)
+
+
+_US = _session("America/New_York", "09:30", "16:00")
+_CA = _session("America/Toronto", "09:30", "16:00")
+_LSE = _session("Europe/London", "08:00", "16:30")
+_XETRA = _session("Europe/Berlin", "09:00", "17:30")
+_GER_REGIONAL = _session("Europe/Berlin", "08:00", "22:00")
+
+# Catalog ``exchange`` codes (Yahoo's) -> session
+EXCHANGE_SESSIONS = {
+    **dict.fromkeys(["NYQ", "NYS", "NMS", "NGM", "NCM", "NAS", "ASE", "PCX", "BTS", "PNK", "OQB", "OQX"], _US),
+    **dict.fromkeys(["TOR", "VAN", "CNQ", "NEO"], _CA),
+    **dict.fromkeys(["LSE", "IOB"], _LSE),
+    "GER": _XETRA,
+    **dict.fromkeys(["FRA", "BER", "DUS", "HAM", "HAN", "MUN", "STU"], _GER_REGIONAL),
+    "PAR": _session("Europe/Paris", "09:00", "17:30"),
+    "AMS": _session("Europe/Amsterdam", "09:00", "17:30"),
+    "BRU": _session("Europe/Brussels", "09:00", "17:30"),
+    "LIS": _session("Europe/Lisbon", "08:00", "16:30"),
+    "MIL": _session("Europe/Rome", "09:00", "17:30"),
+    "MCE": _session("Europe/Madrid", "09:00", "17:30"),
+    "EBS": _session("Europe/Zurich", "09:00", "17:30"),
+    "VIE": _session("Europe/Vienna", "09:00", "17:30"),
+    "STO": _session("Europe/Stockholm", "09:00", "17:30"),
+    "CPH": _session("Europe/Copenhagen", "09:00", "17:00"),
+    "HEL": _session("Europe/Helsinki", "10:00", "18:30"),
+    "OSL": _session("Europe/Oslo", "09:00", "16:20"),
+    "ISE": _session("Europe/Dublin", "08:00", "16:30"),
+    "WSE": _session("Europe/Warsaw", "09:00", "17:00"),
+    "ATH": _session("Europe/Athens", "10:00", "17:20"),
+    "IST": _session("Europe/Istanbul", "10:00", "18:00"),
+    "HKG": _session("Asia/Hong_Kong", "09:30", "16:00"),
+    **dict.fromkeys(["SHH", "SHZ"], _session("Asia/Shanghai", "09:30", "15:00")),
+    **dict.fromkeys(["JPX", "TYO", "OSA"], _session("Asia/Tokyo", "09:00", "15:30")),
+    **dict.fromkeys(["KSC", "KOE"], _session("Asia/Seoul", "09:00", "15:30")),
+    **dict.fromkeys(["TAI", "TWO"], _session("Asia/Taipei", "09:00", "13:30")),
+    "SES": _session("Asia/Singapore", "09:00", "17:00"),
+    **dict.fromkeys(["NSI", "BSE"], _session("Asia/Kolkata", "09:15", "15:30")),
+    "ASX": _session("Australia/Sydney", "10:00", "16:00"),
+    "NZE": _session("Pacific/Auckland", "10:00", "16:45"),
+    "SAO": _session("America/Sao_Paulo", "10:00", "17:00"),
+    "MEX": _session("America/Mexico_City", "08:30", "15:00"),
+    "JNB": _session("Africa/Johannesburg", "09:00", "17:00"),
+    "TLV": _session("Asia/Jerusalem", "09:59", "17:25"),
+    "SAU": _session("Asia/Riyadh", "10:00", "15:00", (6, 0, 1, 2, 3)),
+}
+
+# Yahoo ticker suffix -> exchange code, for symbols missing from the catalogs
+SUFFIX_EXCHANGES = {
+    ".TO": "TOR", ".V": "VAN", ".L": "LSE", ".DE": "GER", ".F": "FRA", ".PA": "PAR",
+    ".AS": "AMS", ".BR": "BRU", ".LS": "LIS", ".MI": "MIL", ".MC": "MCE", ".SW": "EBS",
+    ".VI": "VIE", ".ST": "STO", ".CO": "CPH", ".HE": "HEL", ".OL": "OSL", ".IR": "ISE",
+    ".WA": "WSE", ".AT": "ATH", ".IS": "IST", ".HK": "HKG", ".SS": "SHH", ".SZ": "SHZ",
+    ".T": "JPX", ".KS": "KSC", ".KQ": "KOE", ".TW": "TAI", ".TWO": "TWO", ".SI": "SES",
+    ".NS": "NSI", ".BO": "BSE", ".AX": "ASX", ".NZ": "NZE", ".SA": "SAO", ".MX": "MEX",
+    ".JO": "JNB", ".TA": "TLV", ".SR": "SAU",
+}
+
+# Catalogs checked for a symbol, most specific first
+_LOOKUP_ORDER = ["cryptos", "currencies", "equities", "etfs", "funds", "indices", "moneymarkets"]
+
+
+def _catalog_entry(symbol: str) -> Tuple[Optional[str], Optional[dict]]:
+    for type_key in _LOOKUP_ORDER:
+        if type_key not in VALID_TYPES:
+            continue
+        try:
+            record = load_symbols(type_key).get(symbol)
+        except FileNotFoundError:
+            continue
+        if record is not None:
+            return type_key, record
+    return None, None
+
+
+@lru_cache(maxsize=8192)
+def session_for(symbol: str) -> Session:
+    """Trading session of a symbol, from its catalog type and ``exchange`` field."""
+    type_key, record = _catalog_entry(symbol)
+    if type_key == "cryptos":
+        return ALWAYS_OPEN
+    if type_key == "currencies":
+        return FX
+    session = EXCHANGE_SESSIONS.get((record or {}).get("exchange") or "")
+    if session is not None:
+        return session
+
+    # Not in the catalogs (or an unknown exchange): go by Yahoo's ticker conventions
+    if symbol.endswith("=X"):
+        return FX
+    if "-" in symbol and symbol.rsplit("-", 1)[1] in ("USD", "USDT", "EUR", "BTC", "ETH"):
+        return ALWAYS_OPEN
+    if "." in symbol:
+        exchange = SUFFIX_EXCHANGES.get("." + symbol.rsplit(".", 1)[1])
+        if exchange:
+            return EXCHANGE_SESSIONS[exchange]
+    return _US
+
+
+def _local_day_bounds(session: Session, day: datetime) -> Tuple[datetime, datetime]:
+    tz = ZoneInfo(session.tz)
+    opens = datetime.combine(day.date(), session.open, tz)
+    closes = datetime.combine(day.date(), session.close, tz)
+    if closes <= opens:
+        closes += timedelta(days=1)
+    return opens.astimezone(UTC), closes.astimezone(UTC)
+
+
+def _sessions_from(session: Session, at: datetime):
+    """(open, close) of each trading day from the one containing ``at`` on, in UTC."""
+    day = at.astimezone(ZoneInfo(session.tz)) - timedelta(days=1)
+    for _ in range(15):
+        if day.weekday() in session.weekdays:
+            yield _local_day_bounds(session, day)
+        day += timedelta(days=1)
+
+
+def _aware(ts) -> datetime:
+    ts = pd.Timestamp(ts)
+    return (ts.tz_localize("UTC") if ts.tzinfo is None else ts.tz_convert("UTC")).to_pydatetime()
+
+
+def next_trading_time(session: Session, at, grace: timedelta = timedelta(0)) -> pd.Timestamp:
+    """
+    ``at`` if the market is open then (or within ``grace`` of the close),
+    else the next open. Returned tz-naive UTC, like the stored bars.
+    """
+    at = _aware(at)
+    for opens, closes in _sessions_from(session, at):
+        if at < opens:
+            return pd.Timestamp(opens).tz_localize(None)
+        if at <= closes + grace:
+            return pd.Timestamp(at).tz_localize(None)
+    return pd.Timestamp(at).tz_localize(None)
+
+
+def next_close(session: Session, after) -> pd.Timestamp:
+    """First session close strictly after ``after``, tz-naive UTC."""
+    after = _aware(after)
+    for _, closes in _sessions_from(session, after):
+        if closes > after:
+            return pd.Timestamp(closes).tz_localize(None)
+    return pd.Timestamp(after + timedelta(days=1)).tz_localize(None)
@@ -0,0 +1,321 @@
+import os
+import pickle
+from abc import ABC, abstractmethod
+import threading
+import time
+import uuid
+import zlib
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+import yfinance as yf
+from yfinance.exceptions import YFRateLimitError
+
+from app.services.history_store import (
+    DATA_DIR, MARKET_DATA_PROVIDER, STORE_DIR, TIMESTAMP, file_lock, normalize_bars, split_by_ticker
+)
+from app.services.market_calendar import session_for
+
+# Anything with the yf.Ticker attributes listed in TICKER_FIELDS
+TickerLike = Any
+
+# yf.Ticker attributes the section loaders read
+TICKER_FIELDS = [
+    "info", "actions", "dividends", "splits", "financials", "balance_sheet", "cashflow",
+    "sustainability", "recommendations", "calendar", "options", "isin", "news",
+    "major_holders", "institutional_holders", "mutualfund_holders",
+]
+
+FIXTURES_DIR = DATA_DIR / "fixtures"
+
+_BAR_FREQUENCIES = {
+    "1m": "1min", "5m": "5min", "15m": "15min", "30m": "30min", "1h": "1h",
+    "1d": "1D", "1wk": "W-MON", "1mo": "MS",
+}
+
+
+class MarketDataProvider(ABC):
+    """
+    Where bars and per-symbol data come from. ``download`` answers like
+    ``yf.download(..., group_by="ticker")``, ``ticker`` returns an object
+    with the yf.Ticker attributes in TICKER_FIELDS, ``sector_industries``
+    like ``yf.Sector(sector).industries``. ``network`` providers go through
+    the shared upstream rate limit.
+    """
+
+    name = "base"
+    network = True
+
+    @abstractmethod
+    def download(self, symbols: List[str], start, end, interval: str) -> pd.DataFrame:
+        ...
+
+    @abstractmethod
+    def ticker(self, symbol: str) -> TickerLike:
+        ...
+
+    @abstractmethod
+    def sector_industries(self, sector: str) -> pd.DataFrame:
+        ...
+
+
+class YFinanceProvider(MarketDataProvider):
+    """Live data from Yahoo through yfinance."""
+
+    name = "yfinance"
+
+    def download(self, symbols: List[str], start, end, interval: str) -> pd.DataFrame:
+        # The requests yf.download would make, one per ticker, but without its
+        # catch-all: yf.download records a 429 as that ticker's error and
+        # hands back an empty frame, so the upstream client never saw it
+        intraday = _BAR_FREQUENCIES.get(interval, "1D").endswith(("min", "h"))
+        if intraday:
+            # yfinance reads naive times as exchange-local; intraday windows are
+            # UTC. Daily and coarser windows are exchange dates and stay naive
+            start, end = pd.Timestamp(start).tz_localize("UTC"), pd.Timestamp(end).tz_localize("UTC")
+        frames = {}
+        for symbol in symbols:
+            try:
+                bars = yf.Ticker(symbol).history(start=start, end=end, interval=interval, actions=False)
+            except YFRateLimitError:
+                raise
+            except Exception:
+                # Unknown or delisted ticker: no bars, as from yf.download
+                continue
+            if bars is None or bars.empty:
+                continue
+            if not intraday:
+                # yf.download keeps daily and coarser bars on the exchange date
+                bars.index = bars.index.tz_localize(None)
+            frames[symbol] = bars
+        if not frames:
+            return pd.DataFrame()
+        return pd.concat(frames, axis=1, names=["Ticker", "Price"])
+
+    def ticker(self, symbol: str) -> TickerLike:
+        return yf.Ticker(symbol)
+
+    def sector_industries(self, sector: str) -> pd.DataFrame:
+        return yf.Sector(sector).industries
+
+
+def _unit_noise(seconds: np.ndarray, seed: int) -> np.ndarray:
+    # Deterministic value in [0, 1) per (seed, second): a bar looks the same in every window
+    mixed = (seconds.astype(np.uint64) * np.uint64(2654435761) + np.uint64(seed)) & np.uint64(0xFFFFFFFF)
+    mixed ^= mixed >> np.uint64(16)
+    mixed = (mixed * np.uint64(0x45D9F3B)) & np.uint64(0xFFFFFFFF)
+    mixed ^= mixed >> np.uint64(16)
+    return mixed.astype(np.float64) / 2 ** 32
+
+
+def synthetic_bars(symbol: str, start, end, interval: str) -> pd.DataFrame:
+    """
+    Made-up but stable OHLCV for [start, end), on the bar grid of the
+    interval and within the symbol's trading session. Prices are a function
+    of the bar time, so overlapping windows agree.
+    """
+    end = min(pd.Timestamp(end), pd.Timestamp.utcnow().tz_localize(None))
+    start = pd.Timestamp(start)
+    if start >= end:
+        return normalize_bars(None)
+    frequency = _BAR_FREQUENCIES.get(interval, "1D")
+    intraday = frequency.endswith(("min", "h"))
+    index = pd.date_range(start.floor(frequency) if intraday else start.normalize(), end, freq=frequency, inclusive="left")
+
+    session = session_for(symbol)
+    if intraday:
+        local = index.tz_localize("UTC").tz_convert(session.tz)
+        minutes = local.hour * 60 + local.minute
+        keep = (index >= start) & np.isin(local.weekday, session.weekdays)
+        if session.close > session.open:
+            keep &= (minutes >= session.open.hour * 60 + session.open.minute)
+            keep &= (minutes < session.close.hour * 60 + session.close.minute)
+        index = index[keep]
+    elif frequency == "1D":
+        index = index[np.isin(index.weekday, session.weekdays)]
+    if index.empty:
+        return normalize_bars(None)
+
+    seed = zlib.crc32(symbol.encode())
+    seconds = index.asi8 // 1_000_000_000
+    base = 20 + seed % 480
+    days = seconds / 86400.0
+    trend = base * (1 + 0.25 * np.sin(days / 97.0 + seed % 7) + 0.08 * np.sin(days / 11.0))
+    opens = trend * (1 + 0.01 * (_unit_noise(seconds, seed) - 0.5))
+    closes = trend * (1 + 0.01 * (_unit_noise(seconds, seed + 1) - 0.5))
+    spread = 0.004 * _unit_noise(seconds, seed + 2)
+    bars = pd.DataFrame({
+        "Open": opens,
+        "High": np.maximum(opens, closes) * (1 + spread),
+        "Low": np.minimum(opens, closes) * (1 - spread),
+        "Close": closes,
+        "Adj Close": closes,
+        "Volume": (100_000 * (0.5 + _unit_noise(seconds, seed + 3))).astype(np.int64),
+    }, index=pd.DatetimeIndex(index, name=TIMESTAMP))
+    return bars
+
+
+def _read_pickle(path: Path, default):
+    try:
+        with open(path, "rb") as f:
+            return pickle.load(f)
+    except FileNotFoundError:
+        return default
+
+
+class _FixtureTicker:
+    """yf.Ticker stand-in answering from a recorded dict of fields."""
+
+    def __init__(self, symbol: str, fields: Dict[str, Any], latency: float):
+        self.ticker = symbol
+        self._fields = fields
+        self._latency = latency
+
+    def __getattr__(self, name: str):
+        if name not in TICKER_FIELDS:
+            raise AttributeError(name)
+        time.sleep(self._latency)
+        # Loaders mutate the frames they get, as they may with yfinance's
+        return pickle.loads(pickle.dumps(self._fields.get(name)))
+
+
+class ReplayProvider(MarketDataProvider):
+    """
+    Offline provider for benchmarks and load tests. Answers from fixtures
+    recorded by RecordingProvider:
+
+        {root}/history/{symbol}_{interval}.parquet
+        {root}/tickers/{symbol}.pkl        field -> value
+        {root}/sectors/{sector}.pkl
+
+    History without a fixture is generated by ``synthetic_bars`` (unless
+    ``synthetic`` is off, when the symbol gets no bars, as an unknown
+    ticker would). Every call sleeps ``latency`` seconds first.
+    """
+
+    name = "replay"
+    network = False
+
+    def __init__(self, root: Path = FIXTURES_DIR, latency: float = 0.05, synthetic: bool = True):
+        self.root = root
+        self.latency = latency
+        self.synthetic = synthetic
+
+    def _history(self, symbol: str, start, end, interval: str) -> Optional[pd.DataFrame]:
+        path = self.root / "history" / f"{symbol}_{interval}.parquet"
+        if path.exists():
+            bars = pd.read_parquet(path)
+            return bars[(bars.index >= pd.Timestamp(start)) & (bars.index < pd.Timestamp(end))]
+        return synthetic_bars(symbol, start, end, interval) if self.synthetic else None
+
+    def download(self, symbols: List[str], start, end, interval: str) -> pd.DataFrame:
+        time.sleep(self.latency)
+        frames = {}
+        for symbol in symbols:
+            bars = self._history(symbol, start, end, interval)
+            if bars is not None and not bars.empty:
+                frames[symbol] = bars
+        if not frames:
+            return pd.DataFrame()
+        return pd.concat(frames, axis=1, names=["Ticker", "Price"])
+
+    def ticker(self, symbol: str) -> TickerLike:
+        fields = _read_pickle(self.root / "tickers" / f"{symbol}.pkl", None)
+        if fields is None and self.synthetic:
+            fields = {"info": {"symbol": symbol, "shortName": symbol, "quoteType": "EQUITY"}}
+        return _FixtureTicker(symbol, fields or {}, self.latency)
+
+    def sector_industries(self, sector: str) -> pd.DataFrame:
+        time.sleep(self.latency)
+        return _read_pickle(self.root / "sectors" / f"{sector}.pkl", pd.DataFrame())
+
+
+def _write_pickle(path: Path, value):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f".{path.name}.{uuid.uuid4().hex}.tmp")
+    with open(tmp_path, "wb") as f:
+        pickle.dump(value, f)
+    os.replace(tmp_path, path)
+
+
+class _RecordingTicker:
+    def __init__(self, ticker: TickerLike, provider: "RecordingProvider"):
+        self._ticker = ticker
+        self._provider = provider
+        self.ticker = ticker.ticker
+
+    def __getattr__(self, name: str):
+        value = getattr(self._ticker, name)
+        if name in TICKER_FIELDS:
+            self._provider.record_field(self.ticker, name, value)
+        return value
+
+
+class RecordingProvider(MarketDataProvider):
+    """Passes calls to ``inner`` and saves the answers as ReplayProvider fixtures."""
+
+    name = "record"
+
+    def __init__(self, inner: MarketDataProvider, root: Path = FIXTURES_DIR):
+        self.inner = inner
+        self.root = root
+        self._lock = threading.Lock()
+
+    def download(self, symbols: List[str], start, end, interval: str) -> pd.DataFrame:
+        df = self.inner.download(symbols, start, end, interval)
+        for symbol, bars in split_by_ticker(df, symbols).items():
+            path = self.root / "history" / f"{symbol}_{interval}.parquet"
+            with file_lock(path.with_name(f".{path.name}.lock")):
+                if path.exists():
+                    bars = pd.concat([pd.read_parquet(path), bars])
+                    bars = bars[~bars.index.duplicated(keep="last")].sort_index()
+                path.parent.mkdir(parents=True, exist_ok=True)
+                tmp_path = path.with_name(f".{path.name}.{uuid.uuid4().hex}.tmp")
+                bars.to_parquet(tmp_path)
+                os.replace(tmp_path, path)
+        return df
+
+    def record_field(self, symbol: str, name: str, value):
+        path = self.root / "tickers" / f"{symbol}.pkl"
+        with self._lock, file_lock(path.with_name(f".{path.name}.lock")):
+            fields = _read_pickle(path, {})
+            fields[name] = value
+            _write_pickle(path, fields)
+
+    def ticker(self, symbol: str) -> TickerLike:
+        return _RecordingTicker(self.inner.ticker(symbol), self)
+
+    def sector_industries(self, sector: str) -> pd.DataFrame:
+        industries = self.inner.sector_industries(sector)
+        _write_pickle(self.root / "sectors" / f"{sector}.pkl", industries)
+        return industries
+
+
+def provider_from_env() -> MarketDataProvider:
+    """
+    MARKET_DATA_PROVIDER picks the provider: yfinance (default), replay or
+    record. Replay and record keep fixtures in MARKET_DATA_FIXTURES; replay
+    waits MARKET_DATA_LATENCY_MS per call and synthesizes missing history
+    unless MARKET_DATA_SYNTHETIC=0. Replay refuses to run on the live store
+    (MARKET_DATA_STORE pointing at the default data directory).
+    """
+    kind = MARKET_DATA_PROVIDER
+    root = Path(os.getenv("MARKET_DATA_FIXTURES", str(FIXTURES_DIR)))
+    if kind == "replay":
+        if STORE_DIR.resolve() == DATA_DIR.resolve():
+            raise ValueError("Replay data must not go into the live store: point MARKET_DATA_STORE elsewhere")
+        return ReplayProvider(
+            root,
+            latency=float(os.getenv("MARKET_DATA_LATENCY_MS", "50")) / 1000,
+            synthetic=os.getenv("MARKET_DATA_SYNTHETIC", "1") != "0",
+        )
+    if kind == "record":
+        return RecordingProvider(YFinanceProvider(), root)
+    if kind != "yfinance":
+        raise ValueError(f"Unknown MARKET_DATA_PROVIDER: {kind}")
+    return YFinanceProvider()
+
+
+market_data = provider_from_env()
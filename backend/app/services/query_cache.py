@@ -0,0 +1,118 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List, Tuple
+
+import numpy as np
+
+from app.models.query_filters import FilterCondition
+from app.services.instrument_columns import ColumnStore
+from app.services.local_symbol_service import get_catalog
+
+MAX_ENTRIES = 256
+MAX_BYTES = 64 * 1024 * 1024
+TTL_SECONDS = 300
+
+
+def normalize_filters(conditions: List[FilterCondition]) -> Tuple:
+    # Matching is case-insensitive and "in" is unordered, so equivalent
+    # queries share an entry
+    return tuple(sorted(
+        (c.field, c.op, tuple(sorted(v.lower() for v in c.values)))
+        for c in conditions
+    ))
+
+
+class MatchSetCache:
+    """
+    Bounded LRU + TTL cache of match-sets: the sorted row positions matching
+    a normalized filter query on one catalog version. Pages of the same
+    query are sliced from one entry. Entries of older catalog versions are
+    dropped as soon as a newer version of that catalog is seen.
+    """
+
+    def __init__(self, max_entries: int = MAX_ENTRIES, max_bytes: int = MAX_BYTES, ttl: float = TTL_SECONDS):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries: "OrderedDict[Tuple, Tuple[float, np.ndarray]]" = OrderedDict()
+        self._versions: Dict[str, int] = {}
+        self._bytes = 0
+        self._hits = 0
+        self._misses = 0
+        self._lock = threading.Lock()
+
+    def _drop(self, key):
+        _, positions = self._entries.pop(key)
+        self._bytes -= positions.nbytes
+
+    def _invalidate_older(self, type_key: str, version: int):
+        if self._versions.get(type_key) == version:
+            return
+        self._versions[type_key] = version
+        for key in [k for k in self._entries if k[0] == type_key and k[1] != version]:
+            self._drop(key)
+
+    def get(self, type_key: str, version: int, filters: Tuple, compute: Callable[[], np.ndarray]) -> np.ndarray:
+        key = (type_key, version, filters)
+        now = time.monotonic()
+
+        with self._lock:
+            self._invalidate_older(type_key, version)
+            entry = self._entries.get(key)
+            if entry is not None and now - entry[0] < self.ttl:
+                self._entries.move_to_end(key)
+                self._hits += 1
+                return entry[1]
+            if entry is not None:
+                self._drop(key)
+            self._misses += 1
+
+        positions = compute()
+        positions.setflags(write=False)
+
+        with self._lock:
+            if key not in self._entries and positions.nbytes <= self.max_bytes:
+                self._entries[key] = (now, positions)
+                self._bytes += positions.nbytes
+                while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                    self._drop(next(iter(self._entries)))
+        return positions
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "ttl_seconds": self.ttl,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_ratio": self._hits / lookups if lookups else None,
+            }
+
+
+match_cache = MatchSetCache()
+
+
+def get_matches(instrument_type: str, conditions: List[FilterCondition]) -> Tuple[ColumnStore, np.ndarray]:
+    """Column store of the current catalog and the sorted positions matching ``conditions``."""
+    snapshot = get_catalog(instrument_type)
+    store = snapshot.derived("column_store", ColumnStore.from_snapshot)
+
+    def compute():
+        return store.match(conditions).astype(np.int32)
+
+    positions = match_cache.get(snapshot.type_key, snapshot.version, normalize_filters(conditions), compute)
+    return store, positions
+
+
+def get_match_cache_stats() -> dict:
+    return match_cache.stats()
@@ -1,5 +1,10 @@
+from typing import List
 from fastapi import HTTPException
 from app.models.query_filters import (
+    FILTER_OPERATORS,
+    ORDERED_OPERATORS,
+    ORDERED_FIELD_VALUES,
+    FilterCondition,
     EquityFilters,
     CurrencyFilters,
     CryptoFilters,
@@ -24,3 +29,44 @@ def get_filter_model(instrument_type: str):
         return FILTER_MAP[instrument_type.lower()]
     except KeyError:
         raise HTTPException(status_code=400, detail=f"Unsupported instrument type '{instrument_type}'")
+
+def parse_condition(field: str, value: str) -> FilterCondition:
+    op, sep, operand = value.partition(":")
+    if sep and op.lower() in FILTER_OPERATORS:
+        op = op.lower()
+    else:
+        # No (known) operator prefix: plain substring match, as before
+        op, operand = "contains", value
+
+    if op == "in":
+        values = tuple(v.strip() for v in operand.split(",") if v.strip())
+    else:
+        values = (operand,)
+
+    if not values or not values[0]:
+        raise HTTPException(status_code=400, detail=f"Empty value for filter '{field}'")
+
+    if op in ORDERED_OPERATORS:
+        order = ORDERED_FIELD_VALUES.get(field)
+        if order is None:
+            raise HTTPException(status_code=400, detail=f"Filter '{field}' does not support '{op}'")
+        if values[0].lower() not in (v.lower() for v in order):
+            raise HTTPException(
+                status_code=400,
+                detail=f"Invalid value '{values[0]}' for '{field}'. Must be one of: {order}"
+            )
+
+    return FilterCondition(field, op, values)
+
+def resolve_filters(instrument_type: str, query_params: dict) -> List[FilterCondition]:
+    FilterModel = get_filter_model(instrument_type)
+
+    try:
+        filters = FilterModel(**query_params)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Invalid query params: {str(e)}")
+
+    return [
+        parse_condition(field, value)
+        for field, value in filters.model_dump(exclude_none=True).items()
+    ]
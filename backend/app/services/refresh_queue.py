@@ -0,0 +1,103 @@
+import heapq
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import pandas as pd
+
+from app.services.history_service import BAR_LENGTHS
+from app.services.history_store import HistoryStore, history_store
+from app.services.market_calendar import next_close, next_trading_time, session_for
+
+# Upstream publishes a bar a little after it closes
+INTRADAY_GRACE = pd.Timedelta(seconds=30)
+DAILY_GRACE = pd.Timedelta(minutes=30)
+# Never poll a live intraday series more often than this
+MIN_RECHECK = pd.Timedelta(minutes=1)
+RETRY_DELAY = pd.Timedelta(minutes=5)
+
+SeriesKey = Tuple[str, str]
+
+
+def next_due(symbol: str, interval: str, last_bar: Optional[pd.Timestamp], last_checked: pd.Timestamp) -> pd.Timestamp:
+    """
+    When a series can next have new data. Intraday series are due once the
+    bar after ``last_bar`` has closed (at most every MIN_RECHECK), moved to
+    the next open outside the session; daily and coarser series once the
+    next session close after ``last_checked`` has been published.
+    """
+    session = session_for(symbol)
+    bar_length = BAR_LENGTHS.get(interval, pd.Timedelta(days=1))
+    if bar_length < pd.Timedelta(days=1):
+        due = last_checked + min(bar_length, MIN_RECHECK)
+        if last_bar is not None:
+            due = max(due, last_bar + bar_length + INTRADAY_GRACE)
+        # The last bar of the day may only show up a bar length after the close
+        return next_trading_time(session, due, grace=bar_length + INTRADAY_GRACE)
+    return next_close(session, last_checked) + DAILY_GRACE
+
+
+class RefreshQueue:
+    """
+    Min-heap of stored series by next-due time. Rescheduling pushes a new
+    entry and leaves the old one to be skipped when popped.
+    """
+
+    def __init__(self, store: HistoryStore):
+        self.store = store
+        self._heap: List[Tuple[pd.Timestamp, str, str]] = []
+        self._due: Dict[SeriesKey, pd.Timestamp] = {}
+        self._lock = threading.Lock()
+
+    def _push(self, key: SeriesKey, due: pd.Timestamp):
+        self._due[key] = due
+        heapq.heappush(self._heap, (due, *key))
+
+    def _initial_due(self, symbol: str, interval: str) -> pd.Timestamp:
+        # Scheduled from the last fetch recorded in the index, which outlives restarts
+        meta = self.store.meta(symbol, interval)
+        if meta is None or meta.last_fetch is None:
+            return pd.Timestamp.min
+        return next_due(symbol, interval, meta.last_ts, pd.Timestamp(meta.last_fetch, unit="s"))
+
+    def sync(self, series: Iterable[SeriesKey]):
+        """Track new series and forget the removed ones."""
+        series = set(series)
+        with self._lock:
+            added = series - self._due.keys()
+            for key in self._due.keys() - series:
+                del self._due[key]
+        initial = {key: self._initial_due(*key) for key in added}
+        with self._lock:
+            for key, due in initial.items():
+                self._push(key, due)
+
+    def pop_due(self, now: pd.Timestamp, max_items: int) -> List[SeriesKey]:
+        """Up to ``max_items`` series due by ``now``, most overdue first."""
+        popped = []
+        with self._lock:
+            while self._heap and len(popped) < max_items and self._heap[0][0] <= now:
+                due, symbol, interval = heapq.heappop(self._heap)
+                if self._due.get((symbol, interval)) == due:
+                    del self._due[(symbol, interval)]
+                    popped.append((symbol, interval))
+        return popped
+
+    def reschedule(self, symbol: str, interval: str, checked_at: pd.Timestamp, failed: bool = False):
+        meta = self.store.meta(symbol, interval)
+        # A fetch that failed inside the refresh is in the index, not raised
+        if failed or (meta is not None and (meta.last_error_at or 0) >= checked_at.timestamp()):
+            due = checked_at + RETRY_DELAY
+        else:
+            due = next_due(symbol, interval, meta.last_ts if meta is not None else None, checked_at)
+        with self._lock:
+            self._push((symbol, interval), due)
+
+    def next_due_at(self) -> Optional[pd.Timestamp]:
+        with self._lock:
+            return min(self._due.values(), default=None)
+
+    def __len__(self) -> int:
+        return len(self._due)
+
+
+refresh_queue = RefreshQueue(history_store)
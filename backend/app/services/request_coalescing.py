@@ -0,0 +1,58 @@
+import asyncio
+import os
+from typing import Any, Callable, Dict, Hashable
+
+from starlette.concurrency import run_in_threadpool
+
+# How many blocking upstream fetches may run at once across all requests
+UPSTREAM_CONCURRENCY = int(os.getenv("YF_UPSTREAM_CONCURRENCY", "8"))
+
+_upstream_slots = asyncio.Semaphore(UPSTREAM_CONCURRENCY)
+
+
+async def run_upstream(fn: Callable, *args, **kwargs) -> Any:
+    """Run a blocking upstream call on the threadpool, within the concurrency cap."""
+    async with _upstream_slots:
+        return await run_in_threadpool(fn, *args, **kwargs)
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls sharing a key into one in-flight task whose
+    result (or exception) every caller receives. The key is released once
+    the task finishes, so later calls start a fresh fetch.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+        self.started = 0
+        self.coalesced = 0
+
+    async def do(self, key: Hashable, fn: Callable, *args, **kwargs) -> Any:
+        task = self._inflight.get(key)
+        if task is None:
+            self.started += 1
+            task = asyncio.ensure_future(run_upstream(fn, *args, **kwargs))
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._release(key, done))
+        else:
+            self.coalesced += 1
+        # A caller that disconnects must not cancel the fetch the others wait on
+        return await asyncio.shield(task)
+
+    def _release(self, key: Hashable, task: asyncio.Task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            task.exception()  # Retrieved here in case every waiter went away
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": len(self._inflight),
+            "started": self.started,
+            "coalesced": self.coalesced,
+            "upstream_concurrency": UPSTREAM_CONCURRENCY,
+        }
+
+
+single_flight = SingleFlight()
@@ -0,0 +1,199 @@
+import re
+from array import array
+from bisect import bisect_left
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from app.services.local_symbol_service import VALID_TYPES, CatalogSnapshot, get_catalog
+
+# Rank tiers, best first
+EXACT_SYMBOL = 0
+SYMBOL_PREFIX = 1
+NAME_TOKEN_PREFIX = 2
+SUBSTRING = 3
+
+_TOKEN_SPLIT = re.compile(r"[^0-9a-z]+")
+_NGRAM = 3
+
+
+def _tokenize(text: str) -> List[str]:
+    return [token for token in _TOKEN_SPLIT.split(text) if token]
+
+
+def _ngrams(text: str):
+    return {text[i:i + _NGRAM] for i in range(len(text) - _NGRAM + 1)}
+
+
+class SymbolSearchIndex:
+    """
+    Prebuilt autocomplete index for one catalog snapshot.
+
+    - symbols: lowercased symbols kept sorted, so a prefix lookup is a
+      bisect to the first key followed by a walk over the matching range
+      (the same traversal a prefix trie gives, without a node per char);
+    - names: sorted vocabulary of name tokens with posting lists;
+    - substrings: trigram posting lists over symbol and name, used to narrow
+      the candidates before verifying the substring.
+
+    Every lookup walks only as far as it needs to fill ``limit`` results.
+    """
+
+    def __init__(self, entries: Iterable[Tuple[str, Optional[str]]]):
+        self.symbols: List[str] = []
+        self.names: List[str] = []
+        self._haystacks: List[str] = []
+
+        exact: Dict[str, array] = {}
+        token_postings: Dict[str, array] = {}
+        ngram_postings: Dict[str, array] = {}
+
+        for symbol, name in entries:
+            if not name:
+                continue
+
+            idx = len(self.symbols)
+            self.symbols.append(symbol)
+            self.names.append(name)
+
+            symbol_l = symbol.lower()
+            haystack = f"{symbol_l}\n{name.lower()}"
+            self._haystacks.append(haystack)
+
+            exact.setdefault(symbol_l, array("I")).append(idx)
+            for token in set(_tokenize(haystack[len(symbol_l) + 1:])):
+                token_postings.setdefault(token, array("I")).append(idx)
+            for gram in _ngrams(haystack):
+                ngram_postings.setdefault(gram, array("I")).append(idx)
+
+        self._exact = exact
+        self._symbol_keys = sorted(exact)
+        self._tokens = sorted(token_postings)
+        self._token_postings = token_postings
+        self._ngram_postings = ngram_postings
+
+    @classmethod
+    def from_snapshot(cls, snapshot: CatalogSnapshot) -> "SymbolSearchIndex":
+        if snapshot.binary is not None:
+            # Read the two columns straight from the mapping, not whole records
+            if "name" not in snapshot.binary.columns:
+                return cls(())
+            symbols = snapshot.binary.symbols
+            codes, names = snapshot.binary.columns["name"]
+            return cls(
+                (symbols[pos], names[code] if code >= 0 else None)
+                for pos, code in enumerate(codes.tolist())
+            )
+        return cls(
+            (symbol, item.get("name"))
+            for symbol, item in snapshot.data.items()
+            if item is not None
+        )
+
+    def __len__(self):
+        return len(self.symbols)
+
+    def _prefix_range(self, keys: List[str], prefix: str) -> Iterator[str]:
+        for pos in range(bisect_left(keys, prefix), len(keys)):
+            key = keys[pos]
+            if not key.startswith(prefix):
+                break
+            yield key
+
+    def _candidates(self, q: str):
+        # Exact symbol
+        for idx in self._exact.get(q, ()):
+            yield EXACT_SYMBOL, idx
+
+        # Symbol prefix
+        for key in self._prefix_range(self._symbol_keys, q):
+            for idx in self._exact[key]:
+                yield SYMBOL_PREFIX, idx
+
+        # Name token prefix
+        q_tokens = _tokenize(q)
+        if len(q_tokens) == 1:
+            for token in self._prefix_range(self._tokens, q_tokens[0]):
+                for idx in self._token_postings[token]:
+                    yield NAME_TOKEN_PREFIX, idx
+
+        # Substring of symbol or name
+        grams = _ngrams(q)
+        if grams:
+            postings = [self._ngram_postings.get(gram) for gram in grams]
+            if any(p is None for p in postings):
+                return
+            candidates = min(postings, key=len)
+        else:
+            # Too short for n-grams: anything reaching here is a plain scan
+            candidates = range(len(self.symbols))
+
+        for idx in candidates:
+            if q in self._haystacks[idx]:
+                yield SUBSTRING, idx
+
+    def search(self, q: str, limit: int, max_rank: int = SUBSTRING) -> List[dict]:
+        q = q.strip().lower()
+        if not q:
+            return []
+
+        seen = set()
+        results = []
+        for rank, idx in self._candidates(q):
+            if rank > max_rank:
+                break
+            if idx in seen:
+                continue
+            seen.add(idx)
+            results.append({
+                "symbol": self.symbols[idx],
+                "name": self.names[idx],
+                "rank": rank,
+            })
+            if len(results) >= limit:
+                break
+        return results
+
+
+def get_search_index(instrument_type: str) -> SymbolSearchIndex:
+    return get_catalog(instrument_type).derived("search_index", SymbolSearchIndex.from_snapshot)
+
+
+_search_pool = ThreadPoolExecutor(max_workers=len(VALID_TYPES), thread_name_prefix="symbol-search")
+
+
+def _search_type(instrument_type: str, q: str, limit: int, max_rank: int) -> List[dict]:
+    try:
+        index = get_search_index(instrument_type)
+    except FileNotFoundError:
+        # Catalog not exported for this type
+        return []
+    return [{"type": instrument_type, **hit} for hit in index.search(q, limit, max_rank)]
+
+
+def search_all_types(q: str, limit: int, per_type: int, types: Optional[List[str]] = None) -> List[dict]:
+    """
+    Search several catalogs concurrently and merge the hits into one ranking:
+    by rank tier, then by catalog order of ``types``, then by per-type order.
+    Each type contributes at most ``per_type`` hits.
+
+    The first pass stops before the substring tier; the substring scans only
+    run when the better tiers could not fill ``limit`` across all types.
+    """
+    types = list(types or VALID_TYPES)
+    type_order = {instrument_type: i for i, instrument_type in enumerate(types)}
+
+    def run(max_rank: int) -> List[dict]:
+        futures = [
+            _search_pool.submit(_search_type, instrument_type, q, per_type, max_rank)
+            for instrument_type in types
+        ]
+        hits = [hit for future in futures for hit in future.result()]
+        return hits
+
+    hits = run(NAME_TOKEN_PREFIX)
+    if len(hits) < limit:
+        hits = run(SUBSTRING)
+
+    # Python's sort is stable, so per-type order survives within a tier
+    hits.sort(key=lambda hit: (hit["rank"], type_order[hit["type"]]))
+    return hits[:limit]
@@ -1,4 +1,5 @@
-import yfinance as yf
+from app.services.market_data import market_data
+from app.services.upstream_client import upstream_client
 
 sectors_keys = [
     "basic-materials",
@@ -18,7 +19,7 @@ def get_all_sectors():
     return sectors_keys
 
 def get_industries_by_sector(sector: str):
-        industries = yf.Sector(sector).industries
+        industries = upstream_client.call(market_data.sector_industries, sector)
         return {"sector": sector, "industries": industries}
    
 print(get_industries_by_sector("utilities"))
\ No newline at end of file
@@ -0,0 +1,188 @@
+import json
+import logging
+import os
+import random
+import threading
+import time
+from collections import deque
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+
+from app.services.history_store import DATA_DIR, file_lock
+from app.services.market_data import market_data
+
+logger = logging.getLogger("upstream")
+
+# Requests per second to Yahoo across every process sharing DATA_DIR, and the burst allowed
+RATE_PER_SEC = float(os.getenv("YF_RATE_PER_SEC", "5"))
+RATE_BURST = float(os.getenv("YF_RATE_BURST", "10"))
+MAX_RETRIES = int(os.getenv("YF_MAX_RETRIES", "3"))
+BACKOFF_BASE = 1.0
+BACKOFF_MAX = 60.0
+
+BUCKET_FILE = DATA_DIR / "upstream_bucket.json"
+
+# Failures worth another attempt besides rate limiting, matched by class name
+# since yfinance may sit on requests or curl_cffi
+TRANSIENT_ERRORS = {"ConnectionError", "Timeout", "TimeoutError", "ReadTimeout", "ConnectTimeout", "ChunkedEncodingError"}
+
+
+def is_rate_limited(error: BaseException) -> bool:
+    if type(error).__name__ == "YFRateLimitError":
+        return True
+    message = str(error)
+    return "Too Many Requests" in message or "Rate limited" in message or " 429" in message
+
+
+def is_transient(error: BaseException) -> bool:
+    return is_rate_limited(error) or any(cls.__name__ in TRANSIENT_ERRORS for cls in type(error).__mro__)
+
+
+class SharedTokenBucket:
+    """
+    Token bucket whose state lives in a small JSON file read and rewritten
+    under a file lock, so the API workers and the scheduler draw from one
+    budget. ``pause`` empties it until a given time for everyone, which is
+    how a 429 seen by one process throttles the others.
+    """
+
+    def __init__(self, path: Path, rate: float, burst: float):
+        self.path = path
+        self.rate = rate
+        self.burst = burst
+        self._lock = threading.Lock()
+
+    def _update(self, change: Callable[[dict, float], float]) -> float:
+        with self._lock, file_lock(self.path.with_name(f".{self.path.name}.lock")):
+            now = time.time()
+            try:
+                with open(self.path, "r") as f:
+                    state = json.load(f)
+            except (FileNotFoundError, ValueError):
+                state = {"tokens": self.burst, "updated": now, "paused_until": 0.0}
+            elapsed = max(0.0, now - state["updated"])
+            state["tokens"] = min(self.burst, state["tokens"] + elapsed * self.rate)
+            state["updated"] = now
+            wait = change(state, now)
+            with open(self.path, "w") as f:
+                json.dump(state, f)
+            return wait
+
+    def try_acquire(self) -> float:
+        """Take a token and return 0, or return how long to wait before trying again."""
+        def take(state: dict, now: float) -> float:
+            if state["paused_until"] > now:
+                return state["paused_until"] - now
+            if state["tokens"] >= 1:
+                state["tokens"] -= 1
+                return 0.0
+            return (1 - state["tokens"]) / self.rate
+        return self._update(take)
+
+    def acquire(self):
+        while True:
+            wait = self.try_acquire()
+            if wait <= 0:
+                return
+            time.sleep(min(wait, 1.0))
+
+    def pause(self, seconds: float):
+        def hold(state: dict, now: float) -> float:
+            state["paused_until"] = max(state["paused_until"], now + seconds)
+            state["tokens"] = 0.0
+            return 0.0
+        self._update(hold)
+
+    def paused_for(self) -> float:
+        return self._update(lambda state, now: max(0.0, state["paused_until"] - now))
+
+
+class UpstreamClient:
+    """
+    The one way out to Yahoo. Every call takes a token from the shared
+    bucket first; rate-limited and transient failures are retried with
+    exponential backoff and full jitter, a 429 also pausing the bucket for
+    all processes. Other errors (unknown symbol, missing data) are raised
+    straight away. Without a bucket (offline providers) calls are not
+    rate limited, only retried.
+    """
+
+    def __init__(self, bucket: Optional[SharedTokenBucket], max_retries: int = MAX_RETRIES):
+        self.bucket = bucket
+        self.max_retries = max_retries
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=1024)
+        self._waits = deque(maxlen=1024)
+        self.waiting = 0
+        self.in_flight = 0
+        self.calls = 0
+        self.failures = 0
+        self.rate_limited = 0
+        self.retries = 0
+
+    def _count(self, **changes):
+        with self._lock:
+            for name, delta in changes.items():
+                setattr(self, name, getattr(self, name) + delta)
+
+    def call(self, fn: Callable, *args, **kwargs) -> Any:
+        for attempt in range(self.max_retries + 1):
+            self._count(waiting=1)
+            queued_at = time.perf_counter()
+            try:
+                if self.bucket is not None:
+                    self.bucket.acquire()
+            finally:
+                self._count(waiting=-1)
+            self._waits.append(time.perf_counter() - queued_at)
+
+            self._count(in_flight=1, calls=1)
+            started = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            except Exception as e:
+                self._count(failures=1)
+                if is_rate_limited(e):
+                    self._count(rate_limited=1)
+                    # Everyone holds off, not only this caller
+                    if self.bucket is not None:
+                        self.bucket.pause(min(BACKOFF_MAX, BACKOFF_BASE * 2 ** (attempt + 1)))
+                if not is_transient(e) or attempt == self.max_retries:
+                    raise
+                delay = random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+                logger.warning(f"Upstream call failed ({e}), retry {attempt + 1}/{self.max_retries} in {delay:.1f}s")
+                self._count(retries=1)
+            finally:
+                self._latencies.append(time.perf_counter() - started)
+                self._count(in_flight=-1)
+            time.sleep(delay)
+
+    def throttled_for(self) -> float:
+        """Seconds until the shared bucket hands out tokens again after a 429."""
+        return self.bucket.paused_for() if self.bucket is not None else 0.0
+
+    def stats(self) -> Dict[str, Any]:
+        def percentiles(samples) -> Dict[str, float]:
+            ordered = sorted(samples)
+            if not ordered:
+                return {"p50_ms": 0.0, "p95_ms": 0.0, "max_ms": 0.0}
+            return {
+                "p50_ms": round(ordered[len(ordered) // 2] * 1000, 1),
+                "p95_ms": round(ordered[int(len(ordered) * 0.95)] * 1000, 1),
+                "max_ms": round(ordered[-1] * 1000, 1),
+            }
+        return {
+            "queue_depth": self.waiting,
+            "in_flight": self.in_flight,
+            "calls": self.calls,
+            "failures": self.failures,
+            "rate_limited": self.rate_limited,
+            "retries": self.retries,
+            "throttled_for": round(self.throttled_for(), 1),
+            "latency": percentiles(list(self._latencies)),
+            "queue_wait": percentiles(list(self._waits)),
+        }
+
+
+# Offline providers neither spend nor wait on the budget live processes share
+upstream_client = UpstreamClient(SharedTokenBucket(BUCKET_FILE, RATE_PER_SEC, RATE_BURST) if market_data.network else None)
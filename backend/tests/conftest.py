@@ -0,0 +1,59 @@
+import pandas as pd
+import pytest
+import yfinance as yf
+
+from app.services import history_service
+from app.services import upstream_client as upstream_client_module
+from app.services.history_coverage import CoverageManifest
+from app.services.history_store import HistoryStore
+from app.services.market_data import YFinanceProvider
+from app.services.upstream_client import SharedTokenBucket, upstream_client
+
+
+class ExchangeTicker:
+    """
+    yf.Ticker stand-in serving one bar a minute up to now, reading naive
+    ``start``/``end`` as New York time the way yfinance does. Symbols in
+    ``rate_limited`` raise YFRateLimitError that many times first.
+    """
+
+    tz = "America/New_York"
+    calls = []
+    rate_limited = {}
+
+    def __init__(self, symbol: str):
+        self.ticker = symbol
+
+    def _aware(self, ts) -> pd.Timestamp:
+        ts = pd.Timestamp(ts)
+        return ts.tz_localize(self.tz) if ts.tzinfo is None else ts.tz_convert(self.tz)
+
+    def history(self, start, end, interval, actions=False):
+        self.calls.append(self.ticker)
+        if self.rate_limited.get(self.ticker, 0) > 0:
+            self.rate_limited[self.ticker] -= 1
+            raise yf.exceptions.YFRateLimitError()
+        end = min(self._aware(end), pd.Timestamp.now(tz=self.tz).floor("min"))
+        index = pd.date_range(self._aware(start), end, freq="1min", inclusive="left", name="Datetime")
+        return pd.DataFrame({"Open": 1.0, "High": 1.0, "Low": 1.0, "Close": 1.0, "Volume": 100}, index=index)
+
+
+@pytest.fixture
+def yahoo(monkeypatch):
+    """ExchangeTicker in place of yf.Ticker, with its call log and rate limits reset."""
+    monkeypatch.setattr(yf, "Ticker", ExchangeTicker)
+    monkeypatch.setattr(ExchangeTicker, "calls", [])
+    monkeypatch.setattr(ExchangeTicker, "rate_limited", {})
+    monkeypatch.setattr(upstream_client_module, "BACKOFF_BASE", 0.001)
+    return ExchangeTicker
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch, yahoo):
+    """History store, coverage manifest and token bucket under ``tmp_path``, fetching from ``yahoo``."""
+    store = HistoryStore(tmp_path / "history")
+    monkeypatch.setattr(history_service, "history_store", store)
+    monkeypatch.setattr(history_service, "coverage_manifest", CoverageManifest(store))
+    monkeypatch.setattr(history_service, "market_data", YFinanceProvider())
+    monkeypatch.setattr(upstream_client, "bucket", SharedTokenBucket(tmp_path / "bucket.json", 1000, 1000))
+    return store
@@ -0,0 +1,72 @@
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+from app.services import history_service
+
+
+def test_coverage_matches_the_bars_returned(store):
+    # Longer than New York's UTC offset, so a window read as exchange-local
+    # time still returns bars, hours later than asked
+    end = pd.Timestamp.now("UTC").tz_localize(None).floor("min")
+    start = end - pd.Timedelta(hours=8)
+
+    history_service.refresh_history("AAPL", "1m", start, end)
+
+    covered = history_service.coverage_manifest.covered("AAPL", "1m")
+    assert covered[0][0] == store.first_timestamp("AAPL", "1m") == start
+    assert covered[-1][1] <= store.last_timestamp("AAPL", "1m") + pd.Timedelta(minutes=1)
+
+
+def test_rate_limit_mid_chunk_keeps_the_bars_already_fetched(store, yahoo):
+    end = pd.Timestamp.now("UTC").tz_localize(None).floor("min")
+    start = end - pd.Timedelta(hours=1)
+    yahoo.rate_limited["MSFT"] = 1
+
+    rows = history_service.refresh_histories(["AAPL", "MSFT", "NVDA"], "1m", start, end)
+
+    # Only the throttled ticker is asked again
+    assert Counter(yahoo.calls) == {"AAPL": 1, "MSFT": 2, "NVDA": 1}
+    assert rows == {"AAPL": 60, "MSFT": 60, "NVDA": 60}
+
+
+def test_rate_limit_out_of_retries_stops_the_chunk(store, yahoo, monkeypatch):
+    # One request at a time, so NVDA is only due after MSFT gave up
+    monkeypatch.setattr(history_service, "_request_pool", ThreadPoolExecutor(max_workers=1))
+    end = pd.Timestamp.now("UTC").tz_localize(None).floor("min")
+    start = end - pd.Timedelta(hours=1)
+    yahoo.rate_limited["MSFT"] = 100
+
+    rows = history_service.refresh_histories(["AAPL", "MSFT", "NVDA"], "1m", start, end)
+
+    assert rows == {"AAPL": 60, "MSFT": 0, "NVDA": 0}
+    assert "NVDA" not in yahoo.calls
+    assert history_service.coverage_manifest.covered("AAPL", "1m")
+    assert not history_service.coverage_manifest.covered("NVDA", "1m")
+
+
+def test_chunk_tickers_are_fetched_concurrently(store, yahoo, monkeypatch):
+    in_flight, peak = [0], [0]
+    lock = threading.Lock()
+    history = yahoo.history
+
+    def slow_history(self, *args, **kwargs):
+        with lock:
+            in_flight[0] += 1
+            peak[0] = max(peak[0], in_flight[0])
+        time.sleep(0.05)
+        with lock:
+            in_flight[0] -= 1
+        return history(self, *args, **kwargs)
+
+    monkeypatch.setattr(yahoo, "history", slow_history)
+    end = pd.Timestamp.now("UTC").tz_localize(None).floor("min")
+    symbols = [f"T{i}" for i in range(history_service.MAX_PARALLEL_REQUESTS * 2)]
+
+    rows = history_service.refresh_histories(symbols, "1m", end - pd.Timedelta(hours=1), end)
+
+    assert rows == dict.fromkeys(symbols, 60)
+    assert 1 < peak[0] <= history_service.MAX_PARALLEL_REQUESTS
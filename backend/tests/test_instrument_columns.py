@@ -0,0 +1,9 @@
+from app.services.instrument_columns import Column
+
+
+def test_prefix_codes_match_a_full_scan():
+    column = Column.encode(["Apple", "APPLIED", "apex", "Banana", None, "app", "Ap", "Zebra", "apple"])
+
+    for prefix in ["ap", "APP", "apple", "b", "z", "q", ""]:
+        expected = [code for code, value in enumerate(column.lowered) if value.startswith(prefix.lower())]
+        assert sorted(column.codes_with_prefix(prefix)) == expected